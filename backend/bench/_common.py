@@ -0,0 +1,66 @@
+"""Outils partagés des benchmarks (hors application, non importés par main).
+
+Les références "avant" sont chargées depuis l'historique git (`load_revision`):
+les chiffres des messages de commit se reproduisent sans recopier l'ancien code.
+"""
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import warnings
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO = os.path.dirname(BACKEND)
+BASELINE_REV = "ca57fdf"  # commit initial, avant le backlog de performance
+
+warnings.filterwarnings("ignore", message=".*fitz.*")
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+VOCAB = (
+    "revenue growth invest investments strategy market margin quarterly risk liquidity capital forecast the and of"
+).split()
+
+def load_revision(rev: str = BASELINE_REV):
+    """Importe backend/main.py tel qu'il était à la révision `rev` (module distinct de `main`)."""
+    src = subprocess.run(
+        ["git", "show", f"{rev}:backend/main.py"], cwd=REPO, capture_output=True, text=True, check=True
+    ).stdout
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_"), f"main_{rev}.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(src)
+    spec = importlib.util.spec_from_file_location(f"main_{rev}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_text(paragraphs: int, vocab_size: int = 20000, seed: int = 1) -> str:
+    """Texte de paragraphes aléatoires: `vocab_size` termes rares + un petit vocabulaire métier."""
+    rnd = random.Random(seed)
+    vocab = ["w%05d" % i for i in range(vocab_size)] + VOCAB[:12]
+    return "\n".join(
+        " ".join(rnd.choice(vocab) for _ in range(rnd.randint(5, 40))) + "." for _ in range(paragraphs)
+    )
+
+def make_pdf(pages: int, path: str, seed: int = 0) -> str:
+    """PDF synthétique: 40 lignes de 12 mots par page."""
+    import fitz
+
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        y = 50
+        for j in range(40):
+            page.insert_text((50, y), " ".join(rnd.choice(VOCAB) for _ in range(12)) + f" p{i} l{j}.", fontsize=9)
+            y += 18
+    doc.save(path)
+    doc.close()
+    return path
+
+def percentiles(samples: list) -> str:
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))] * 1000  # noqa: E731
+    return "n=%d p50 %.1f ms, p99 %.1f ms, max %.1f ms" % (len(s), pick(0.5), pick(0.99), s[-1] * 1000)
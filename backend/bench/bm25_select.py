@@ -0,0 +1,36 @@
+"""select_passages: BM25 sur l'index du document vs balayage score_chunk de la référence (user-002).
+
+    python bench/bm25_select.py                   # ~5.9k chunks, 20k termes
+    python bench/bm25_select.py --paragraphs 5000 # plus rapide (la référence est lente)
+"""
+import argparse
+import time
+
+from _common import BASELINE_REV, load_revision, synthetic_text
+
+import main
+
+QUESTIONS = ["revenue growth risk", "investments capital", "quaterly forcast"]
+
+def run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--paragraphs", type=int, default=30000)
+    ap.add_argument("--rev", default=BASELINE_REV, help="révision de référence")
+    args = ap.parse_args()
+
+    old = load_revision(args.rev)
+    text = main.tidy_text(synthetic_text(args.paragraphs))
+    t0 = time.perf_counter()
+    doc = main.build_doc_entry(text, 1, len(text.split()))
+    print("chunks %d, index %.0f ms" % (len(doc.starts), (time.perf_counter() - t0) * 1000))
+    for q in QUESTIONS:
+        t0 = time.perf_counter()
+        old.select_passages(text, q)
+        t_old = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        main.select_passages(doc, q, 6, 10000)
+        t_new = time.perf_counter() - t0
+        print("%-22s %s: %9.1f ms   HEAD: %7.1f ms" % (q, args.rev, t_old * 1000, t_new * 1000))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,44 @@
+"""Mémoire résidente d'une entrée DOC_STORE: CompactDoc vs dict de listes de la révision précédente (user-025).
+
+Mesure tracemalloc autour de build_doc_entry; le texte existe déjà avant la mesure: il n'est pas compté.
+
+    python bench/doc_memory.py                       # ~2.3 MB et ~0.5 MB de texte
+    python bench/doc_memory.py --rev e80ba82 --paragraphs 4000
+"""
+import argparse
+import tracemalloc
+
+from _common import load_revision, synthetic_text
+
+import main
+
+PREV_REV = "e80ba82"  # dernier commit avant CompactDoc
+
+def _measure(build, text: str) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entry = build(text, 1, len(text.split()))
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del entry
+    return size
+
+def run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rev", default=PREV_REV, help="révision de référence")
+    ap.add_argument("--paragraphs", type=int, nargs="+", default=[14500, 3200])
+    ap.add_argument("--vocab", type=int, default=20000)
+    args = ap.parse_args()
+
+    old = load_revision(args.rev)
+    for n in args.paragraphs:
+        text = main.tidy_text(synthetic_text(n, args.vocab))
+        old_size = _measure(old.build_doc_entry, text)
+        new_size = _measure(main.build_doc_entry, text)
+        report = main.build_doc_entry(text, 1, 1).memory_report()
+        print("texte %.2f MB: %s %.2f MB -> HEAD %.2f MB (hors texte)" % (
+            len(text) / 1e6, args.rev, old_size / 1e6, new_size / 1e6))
+        print("  memory_report (octets):", report)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,41 @@
+"""Coût de l'empreinte de contenu complète vs l'ancien hash des 20 000 premiers caractères (user-011).
+
+    python bench/fingerprint.py          # ~6 MB de texte en pages de 3 Ko
+"""
+import argparse
+import hashlib
+import time
+
+from _common import synthetic_text
+
+import main
+
+def _per_page(hasher, pages) -> str:
+    # Même alimentation que extract_pdf_text_sorted (_hash_pages): page + séparateur
+    for p in main._hash_pages(pages, hasher):
+        pass
+    return hasher.hexdigest()
+
+def run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--paragraphs", type=int, default=40000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    text = synthetic_text(args.paragraphs, seed=0)
+    pages = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+    print("%.1f MB, %d pages" % (len(text) / 1e6, len(pages)))
+    cases = [
+        ("sha256, 20k premiers caractères", lambda: hashlib.sha256(text[:20000].encode("utf-8")).hexdigest()),
+        ("sha256, complet par page", lambda: _per_page(hashlib.sha256(), pages)),
+        ("blake2b à clé, complet par page", lambda: _per_page(hashlib.blake2b(key=b"k" * 32, digest_size=32), pages)),
+    ]
+    for name, fn in cases:
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        print("%-34s %8.2f ms" % (name, (time.perf_counter() - t0) / args.repeat * 1000))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+"""Latence par appel: client OpenAI créé à chaque appel (référence) vs client partagé du processus (user-013).
+
+Démarre bench/mock_openai.py en HTTP local: la poignée de main TLS d'api.groq.com n'est pas comptée,
+l'écart réel est donc plus grand.
+
+    python bench/groq_client.py --calls 200
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from _common import BACKEND
+
+PORT = 8777
+os.environ.update(GROQ_API_KEY="bench", GROQ_BASE_URL=f"http://127.0.0.1:{PORT}/v1", GROQ_ROUTING="0")
+
+import main  # noqa: E402
+import openai  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def _per_call_client():
+    client = openai.OpenAI(api_key="bench", base_url=os.environ["GROQ_BASE_URL"])
+    return client.chat.completions.create(model="m", messages=MESSAGES, max_tokens=5)
+
+async def _timed_async(n: int) -> float:
+    await main._groq_chat_async(MESSAGES, 5)  # création du client partagé hors mesure
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await main._groq_chat_async(MESSAGES, 5)
+    return (time.perf_counter() - t0) / n
+
+def run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    args = ap.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mock_openai:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=os.path.join(BACKEND, "bench"),
+    )
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{PORT}/stats", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        _per_call_client()
+        t0 = time.perf_counter()
+        for _ in range(args.calls):
+            _per_call_client()
+        per_call = (time.perf_counter() - t0) / args.calls
+        shared = asyncio.run(_timed_async(args.calls))
+        print("nouveau client par appel: %6.2f ms/appel" % (per_call * 1000))
+        print("client partagé (pool):    %6.2f ms/appel" % (shared * 1000))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+"""Serveur local compatible OpenAI (chat.completions, avec ou sans stream) pour les benchmarks.
+
+    uvicorn mock_openai:app --port 8777     # depuis backend/bench
+MOCK_DELAY (s) simule la latence du modèle.
+"""
+import asyncio
+import json
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+DELAY = float(os.getenv("MOCK_DELAY", "0"))
+STATS = {"calls": 0}
+_HEADERS = {
+    "x-ratelimit-limit-requests": "100000", "x-ratelimit-remaining-requests": "100000",
+    "x-ratelimit-limit-tokens": "10000000", "x-ratelimit-remaining-tokens": "10000000",
+    "x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "1s",
+}
+
+@app.get("/stats")
+def stats():
+    return STATS
+
+@app.post("/v1/chat/completions")
+async def chat(request: Request):
+    body = await request.json()
+    STATS["calls"] += 1
+    if DELAY:
+        await asyncio.sleep(DELAY)
+    content = f"Answer from mock {body['model']}."
+    if body.get("stream"):
+        async def gen():
+            for word in content.split(" "):
+                chunk = {"id": "x", "object": "chat.completion.chunk", "created": 1, "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                yield "data: " + json.dumps(chunk) + "\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream", headers=_HEADERS)
+    return JSONResponse(
+        {"id": "x", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+         "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+         "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}},
+        headers=_HEADERS,
+    )
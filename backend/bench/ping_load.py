@@ -0,0 +1,91 @@
+"""Latence de /ping pendant des uploads concurrents (user-007).
+
+Lance `uvicorn main:app` (arbre courant, ou `--rev` pour une ancienne révision), envoie `--uploads`
+PDF distincts de `--pages` pages en parallèle (admin: pas de paywall) et interroge /ping toutes
+les 20 ms pendant `--seconds`. Sans GROQ_API_KEY: seuls extraction / découpage / index sont mesurés.
+
+    python bench/ping_load.py                 # arbre courant
+    python bench/ping_load.py --rev ca57fdf   # avant le déport hors boucle
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from _common import BACKEND, REPO, make_pdf, percentiles
+
+def _server_dir(rev: str) -> str:
+    if not rev:
+        return BACKEND
+    src = subprocess.run(
+        ["git", "show", f"{rev}:backend/main.py"], cwd=REPO, capture_output=True, text=True, check=True
+    ).stdout
+    d = tempfile.mkdtemp(prefix="bench_srv_")
+    with open(os.path.join(d, "main.py"), "w", encoding="utf-8") as f:
+        f.write(src)
+    return d
+
+async def _run(url: str, pdfs: list, seconds: float) -> list:
+    async with httpx.AsyncClient(base_url=url, timeout=600) as c:
+        async def upload(data):
+            r = await c.post(
+                "/api/summarize", files={"file": ("x.pdf", data, "application/pdf")}, headers={"x-admin-token": "bench"}
+            )
+            return r.status_code
+
+        latencies = []
+        uploads = [asyncio.create_task(upload(d)) for d in pdfs]
+        end = time.time() + seconds
+        while time.time() < end:
+            t0 = time.perf_counter()
+            await c.get("/ping")
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.02)
+        print("upload status:", await asyncio.gather(*uploads))
+        return latencies
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rev", default="", help="révision git de backend/main.py (défaut: arbre courant)")
+    ap.add_argument("--pages", type=int, default=600)
+    ap.add_argument("--uploads", type=int, default=3)
+    ap.add_argument("--seconds", type=float, default=8)
+    ap.add_argument("--cpus", type=int, default=1, help="cœurs alloués au serveur (affinité)")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_pdf_")
+    pdfs = []
+    for i in range(args.uploads):
+        path = make_pdf(args.pages, os.path.join(tmp, f"doc{i}.pdf"), seed=i)  # contenus distincts: pas de cache
+        with open(path, "rb") as f:
+            pdfs.append(f.read())
+
+    env = dict(os.environ, ADMIN_BYPASS_TOKEN="bench", GROQ_API_KEY="", CACHE_DB_PATH="")
+    cpus = set(sorted(os.sched_getaffinity(0))[: args.cpus]) if hasattr(os, "sched_getaffinity") else None
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=_server_dir(args.rev), env=env,
+        preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(url + "/ping", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        latencies = asyncio.run(_run(url, pdfs, args.seconds))
+        print(f"/ping ({args.rev or 'HEAD'}, {args.uploads} uploads x {args.pages} pages):", percentiles(latencies))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
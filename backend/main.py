@@ -1,15 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, Request
+from fastapi import FastAPI, File, UploadFile, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import tempfile
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
+import asyncio
+import functools
 import fitz  # PyMuPDF
+import httpx
+import openai
 import uuid
 import json
 import re
+import unicodedata
 from difflib import SequenceMatcher
 import hashlib
-from time import time
+import heapq
+import itertools
+import operator
+import bisect
+from array import array
+import math
+import random
+from time import time, perf_counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import threading
+import sys
+import multiprocessing
+import sqlite3
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -22,18 +40,298 @@ FREE_WORD_LIMIT = int(os.getenv("FREE_WORD_LIMIT", "50000"))
 ADMIN_BYPASS_TOKEN = os.getenv("ADMIN_BYPASS_TOKEN")
 PREMIUM_TOKENS = [t.strip() for t in os.getenv("PREMIUM_TOKENS", "").split(",") if t.strip()]
 
-# ------- In-memory stores (MVP) -------
-DOC_STORE = {}       # doc_id -> {"text": str, "pages": int, "words": int, "chunks": [{"text": str, "norm": str}]}
-SUMMARY_CACHE = {}   # key: doc_hash -> {"md": str, "ts": float}
-QA_CACHE = {}        # key: (doc_id, normalized_q) -> {"answer": str, "ts": float}
+# ------- Bounded caches -------
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_SWEEP_SECONDS = int(os.getenv("CACHE_SWEEP_SECONDS", "300"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "").strip()  # vide = caches en mémoire uniquement
+
+class SQLiteStore:
+    """Tier persistant optionnel (SQLite en mode WAL), partagé par les workers d'un même hôte.
+    Valeurs JSON, une table clé/valeur par espace de noms (nom du cache)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, ts REAL NOT NULL, "
+                "PRIMARY KEY (ns, key))"
+            )
+
+    def _conn(self):
+        # Une connexion par thread (pools asyncio/CPU/LLM)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, ns: str, key: str, ttl: float = 0):
+        row = self._conn().execute("SELECT value, ts FROM kv WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        if row is None or (ttl and time() - row[1] > ttl):
+            return None
+        return json.loads(row[0])
+
+    def put(self, ns: str, key: str, value):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, ts) VALUES (?, ?, ?, ?)",
+                (ns, key, json.dumps(value, ensure_ascii=False), time()),
+            )
+
+    def touch(self, ns: str, key: str):
+        with self._conn() as conn:
+            conn.execute("UPDATE kv SET ts = ? WHERE ns = ? AND key = ?", (time(), ns, key))
+
+    def purge(self, ns: str, ttl: float) -> int:
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM kv WHERE ns = ? AND ts < ?", (ns, time() - ttl)).rowcount
+
+CACHE_DB = SQLiteStore(CACHE_DB_PATH) if CACHE_DB_PATH else None
+
+class LRUCache:
+    """Cache LRU borné en entrées et en octets (taille approx. via `sizeof`), avec TTL.
+    Thread-safe; compteurs hit/miss/eviction/expired exposés par stats().
+    Avec `store` (SQLiteStore), la mémoire sert de tier chaud devant le tier persistant:
+    `encode`/`decode` convertissent les valeurs en JSON et inversement."""
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int = 0, ttl: float = CACHE_TTL_SECONDS,
+                 sizeof=None, store=None, encode=None, decode=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._store = store
+        self._encode = encode or (lambda v: v)
+        self._decode = decode or (lambda v: v)
+        self._data = OrderedDict()  # key -> (value, ts, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = self.store_hits = 0
+
+    @staticmethod
+    def _store_key(key) -> str:
+        return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False)
+
+    def _drop(self, key):
+        _, _, nbytes = self._data.pop(key)
+        self._bytes -= nbytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl and time() - item[1] > self.ttl:
+                self._drop(key)
+                self.expired += 1
+                item = None
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+        if self._store is not None:
+            raw = self._store.get(self.name, self._store_key(key), self.ttl)
+            if raw is not None:
+                value = self._decode(raw)
+                self._put_local(key, value)
+                with self._lock:
+                    self.store_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def values(self) -> list:
+        """Instantané des valeurs en mémoire (sans toucher à l'ordre LRU)."""
+        with self._lock:
+            return [v for v, _, _ in self._data.values()]
+
+    def __setitem__(self, key, value):
+        self._put_local(key, value)
+        if self._store is not None:
+            self._store.put(self.name, self._store_key(key), self._encode(value))
+
+    def touch(self, key) -> bool:
+        """Rafraîchit l'âge d'une entrée résidente (mémoire + tier persistant) sans la réécrire.
+        False si la clé n'est pas en mémoire."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False
+            self._data[key] = (item[0], time(), item[2])
+            self._data.move_to_end(key)
+        if self._store is not None:
+            self._store.touch(self.name, self._store_key(key))
+        return True
+
+    def _put_local(self, key, value):
+        nbytes = self._sizeof(value) if self._sizeof else 0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, time(), nbytes)
+            self._bytes += nbytes
+            while self._data and (
+                len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def sweep(self) -> int:
+        """Supprime les entrées expirées (appelé périodiquement en tâche de fond)."""
+        if not self.ttl:
+            return 0
+        limit = time() - self.ttl
+        with self._lock:
+            # OrderedDict en ordre LRU, pas en ordre d'âge: on parcourt tout
+            old = [k for k, (_, ts, _) in self._data.items() if ts < limit]
+            for k in old:
+                self._drop(k)
+            self.expired += len(old)
+        if self._store is not None:
+            self._store.purge(self.name, self.ttl)
+        return len(old)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "store_hits": self.store_hits,
+            "persistent": self._store is not None,
+        }
+
+def _doc_nbytes(entry) -> int:
+    return entry.nbytes()
+
+# Persisté: texte + compteurs seulement; chunks et index reconstruits au chargement
+def _doc_encode(entry) -> dict:
+    return {"text": entry.text, "pages": entry.pages, "words": entry.words, "fingerprint": entry.fingerprint}
+
+def _doc_decode(value: dict):
+    return build_doc_entry(value["text"], value["pages"], value["words"], value.get("fingerprint"))
+
+DOC_STORE = LRUCache(     # empreinte du contenu -> CompactDoc (une seule copie par document)
+    "documents",
+    max_entries=int(os.getenv("DOC_STORE_MAX_ENTRIES", "200")),
+    max_bytes=int(os.getenv("DOC_STORE_MAX_MB", "512")) * 1024 * 1024,
+    sizeof=_doc_nbytes,
+    store=CACHE_DB,
+    encode=_doc_encode,
+    decode=_doc_decode,
+)
+EXTRACT_CACHE = LRUCache(  # sha256(octets du PDF) -> même entrée que DOC_STORE (ré-upload sans PyMuPDF)
+    "extractions",
+    max_entries=int(os.getenv("EXTRACT_CACHE_MAX_ENTRIES", "200")),
+    max_bytes=int(os.getenv("EXTRACT_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    sizeof=_doc_nbytes,
+    store=CACHE_DB,
+    encode=_doc_encode,
+    decode=_doc_decode,
+)
+DOC_IDS = LRUCache(  # doc_id -> empreinte du contenu (clé DOC_STORE)
+    "doc_ids", max_entries=int(os.getenv("DOC_ID_MAX_ENTRIES", "20000")), store=CACHE_DB
+)
+SUMMARY_CACHE = LRUCache(  # doc_hash -> {"md"}
+    "summaries", max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000")), store=CACHE_DB
+)
+QA_CACHE = LRUCache(  # (doc fingerprint, normalized_q) -> {"answer"}
+    "qa", max_entries=int(os.getenv("QA_CACHE_MAX_ENTRIES", "20000")), store=CACHE_DB
+)
+CACHES = [DOC_STORE, DOC_IDS, EXTRACT_CACHE, SUMMARY_CACHE, QA_CACHE]
+
+class SingleFlight:
+    """Coalesce les appels concurrents de même clé sur une seule exécution (boucle asyncio).
+    La tâche partagée est protégée (shield): l'annulation d'un appelant n'annule pas les autres."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self.calls = self.coalesced = 0
+
+    async def do(self, key, fn):
+        """`fn`: fabrique de coroutine, appelée seulement si aucun calcul n'est en cours pour `key`.
+        Si le calcul attendu est abandonné (claim annulé), l'appel suivant le relance."""
+        while True:
+            task = self._inflight.get(key)
+            if task is None or task.cancelled():
+                self.calls += 1
+                task = self._track(key, asyncio.ensure_future(fn()))
+                return await asyncio.shield(task)
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise  # l'appelant lui-même est annulé
+
+    def claim(self, key):
+        """Calcul piloté par l'appelant (ex. flux SSE): Future à résoudre (set_result) si aucun calcul
+        n'est en cours pour `key`, sinon None (attendre via do). À annuler si l'appelant abandonne."""
+        if self._inflight.get(key) is not None:
+            return None
+        self.calls += 1
+        return self._track(key, asyncio.get_running_loop().create_future())
+
+    def _track(self, key, fut):
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda f: self._inflight.pop(key, None) if self._inflight.get(key) is f else None)
+        return fut
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+EXTRACT_FLIGHT = SingleFlight("extract")    # (sha256 des octets, privilégié)
+SUMMARY_FLIGHT = SingleFlight("summarize")  # empreinte du document
+QA_FLIGHT = SingleFlight("ask")             # (empreinte du document, question normalisée)
+FLIGHTS = [EXTRACT_FLIGHT, SUMMARY_FLIGHT, QA_FLIGHT]
+
+async def _sweep_caches():
+    while True:
+        await asyncio.sleep(CACHE_SWEEP_SECONDS)
+        for cache in CACHES:
+            await asyncio.to_thread(cache.sweep)
+        if CACHE_DB is not None:
+            await asyncio.to_thread(CACHE_DB.purge, "jobs", JOB_TTL_SECONDS)
+
+# Empreinte de contenu complète (clé du cache de résumés). DOC_HASH_ALGO=blake2b (+ DOC_HASH_KEY optionnelle)
+# donne un hash à clé: les empreintes ne sont pas prévisibles sans la clé.
+DOC_HASH_ALGO = os.getenv("DOC_HASH_ALGO", "sha256").strip().lower()
+DOC_HASH_KEY = os.getenv("DOC_HASH_KEY", "").encode("utf-8")[:64]
+
+def new_doc_hasher():
+    if DOC_HASH_ALGO == "blake2b":
+        return hashlib.blake2b(key=DOC_HASH_KEY, digest_size=32)
+    return hashlib.sha256()
 
 def _doc_hash(s: str) -> str:
-    return hashlib.sha256((s or "")[:20000].encode("utf-8", "ignore")).hexdigest()
+    """Empreinte du texte complet (documents sans empreinte calculée à l'extraction)."""
+    h = new_doc_hasher()
+    h.update((s or "").encode("utf-8", "ignore"))
+    return h.hexdigest()
 
 def _norm_q(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").strip().lower())
 
-app = FastAPI(title="Smart PDF I-Gen Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(_sweep_caches())
+    _start_job_workers()
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        await _stop_job_workers()
+
+app = FastAPI(title="Smart PDF I-Gen Backend", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -59,45 +357,197 @@ def is_premium(request: Request) -> bool:
     tok = request.headers.get("x-premium-token", "")
     return bool(tok and tok in PREMIUM_TOKENS)
 
+# ---------- Execution pools ----------
+# Les endpoints async délèguent le travail bloquant: la boucle reste libre pour /ping et les autres requêtes.
+# Les appels LLM sont natifs asyncio (AsyncOpenAI), sans thread.
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "2"))
+_PDF_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf")  # PyMuPDF n'est pas thread-safe
+_CPU_POOL = ThreadPoolExecutor(max_workers=CPU_POOL_WORKERS, thread_name_prefix="cpu")
+
+async def _run_in(pool, fn, *args):
+    """Exécute `fn(*args)` dans `pool` sans bloquer la boucle asyncio."""
+    return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+
 # ---------- Text helpers ----------
-def extract_pdf_text_sorted(pdf_path: str) -> str:
-    """Extraction robuste: blocs triés (y,x) + fallback + normalisation."""
-    import unicodedata
-    doc = fitz.open(pdf_path)
-    pages = []
-    for page in doc:
-        blocks = page.get_text("blocks") or []
-        blocks.sort(key=lambda b: (round(b[1], 1), round(b[0], 1)))  # (y, x)
-        txt = "\n".join(b[4] for b in blocks if isinstance(b[4], str) and b[4].strip())
-        if len((txt or "").strip()) < 40:
-            txt = page.get_text("text")
-        txt = unicodedata.normalize("NFKC", (txt or "")).replace("\x00", "")
-        pages.append(txt)
-    doc.close()
-    return "\n\n".join(pages)
-
-def tidy_text(s: str) -> str:
-    import unicodedata
-    s = unicodedata.normalize("NFKC", s or "")
-    s = s.replace("\u200b", "").replace("\x00", "")
-    s = re.sub(r"[^\S\r\n]+", " ", s)
-    s = re.sub(r"[-_]{4,}", "—", s)
-    s = re.sub(r"\b(\w{2,})(?:\W+\1){7,}\b", r"\1", s, flags=re.IGNORECASE)
-    s = re.sub(r"\n{3,}", "\n\n", s)
+PDF_EXTRACT_MAX_DEFAULT_WORKERS = 4
+
+def _default_extract_workers() -> int:
+    """Cœurs attribués au processus (affinité: os.cpu_count() donne ceux de l'hôte en conteneur), plafonnés."""
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:  # hors Linux
+        n = os.cpu_count() or 1
+    return max(1, min(n, PDF_EXTRACT_MAX_DEFAULT_WORKERS))
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(_default_extract_workers())))
+PARALLEL_EXTRACT_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACT_MIN_PAGES", "200"))
+_EXTRACT_POOL = None
+
+def _get_extract_pool():
+    """Pool de processus partagé (créé à la demande): PyMuPDF n'est pas thread-safe.
+    forkserver: le pool naît d'un thread dans un processus déjà multi-threadé (fork y peut bloquer)."""
+    global _EXTRACT_POOL
+    if _EXTRACT_POOL is None:
+        _EXTRACT_POOL = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _EXTRACT_POOL
+
+def _page_text(page) -> str:
+    """Blocs triés (y,x) + fallback texte brut + NFKC (seul passage NFKC du pipeline d'ingestion)."""
+    blocks = page.get_text("blocks") or []
+    blocks.sort(key=lambda b: (round(b[1], 1), round(b[0], 1)))  # (y, x)
+    txt = "\n".join(b[4] for b in blocks if isinstance(b[4], str) and b[4].strip())
+    if len((txt or "").strip()) < 40:
+        txt = page.get_text("text")
+    return unicodedata.normalize("NFKC", (txt or "")).replace("\x00", "")
+
+def _extract_page_range(data: bytes, start: int, end: int) -> list:
+    """Worker: chaque processus ouvre son propre document fitz (depuis les octets du PDF)."""
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return [_page_text(doc[i]) for i in range(start, end)]
+    finally:
+        doc.close()
+
+def _hash_pages(pages, hasher):
+    """Met à jour `hasher` page par page pendant la jointure (pas de copie du texte complet)."""
+    for p in pages:
+        if hasher is not None:
+            hasher.update(p.encode("utf-8", "ignore"))
+            hasher.update(b"\f")
+        yield p
+
+def extract_pdf_text_sorted(doc, data: bytes, hasher=None) -> str:
+    """Extraction robuste: blocs triés (y,x) + fallback + normalisation.
+    `doc` est le document déjà ouvert; `data` (octets du PDF) sert aux workers pour les gros documents,
+    dont les plages de pages sont réparties sur un pool de processus puis réassemblées dans l'ordre.
+    `hasher` (optionnel) reçoit chaque page dans l'ordre: empreinte du contenu complet.
+    Coût mémoire par worker: une copie des octets du PDF par plage (picklée) + le texte de sa plage,
+    plus un processus résident qui a réimporté tout `main` (SQLiteStore, pools, app)."""
+    n = doc.page_count
+    if PDF_EXTRACT_WORKERS <= 1 or n < PARALLEL_EXTRACT_MIN_PAGES:
+        return "\n\n".join(_hash_pages((_page_text(page) for page in doc), hasher))
+    # Une plage contiguë par worker: les octets ne sont envoyés qu'une fois à chaque processus
+    step = max(1, -(-n // PDF_EXTRACT_WORKERS))
+    starts = list(range(0, n, step))
+    parts = _get_extract_pool().map(
+        _extract_page_range, [data] * len(starts), starts, [min(s + step, n) for s in starts]
+    )
+    return "\n\n".join(_hash_pages((p for part in parts for p in part), hasher))
+
+_TIDY_DROP = {0x200B: None, 0x00: None}
+_HSPACE_RE = re.compile(r"[^\S\r\n]+")
+_DASH_RUN_RE = re.compile(r"[-_]{4,}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_WORD_SPLIT_RE = re.compile(r"(\W+)")
+REPEAT_RUN_MIN = 8  # mot + 7 répétitions
+# re.I compare les caractères un à un en minuscule simple; str.lower() applique la casse complète,
+# qui n'en diffère que pour "İ" ("i" + point combinant) et "Σ" (sigma final selon le contexte).
+_SIMPLE_LOWER_FIX = {0x130: "i", 0x3A3: "σ"}
+
+def _collapse_repeats(s: str) -> str:
+    """Remplace chaque suite de >= REPEAT_RUN_MIN mots identiques (casse ignorée, >= 2 caractères,
+    séparés par n'importe quels non-mots) par sa première occurrence. Même sortie que
+    re.sub(r"\b(\w{2,})(?:\W+\1){7,}\b", r"\1", s, flags=re.I), sans référence arrière:
+    un split, une comparaison mot[i] == mot[i+7] en C, puis une vérification bornée par candidat."""
+    parts = _WORD_SPLIT_RE.split(s)  # mots aux indices pairs, séparateurs aux impairs
+    if "İ" in s or "Σ" in s:
+        # même découpage: les deux substitutions gardent la longueur et restent des \w
+        low = [w.lower() for w in _WORD_SPLIT_RE.split(s.translate(_SIMPLE_LOWER_FIX))[::2]]
+    else:
+        low = [w.lower() for w in parts[::2]]
+    n = len(low)
+    span = REPEAT_RUN_MIN - 1
+    out, pos, skip = [], 0, 0
+    for i in itertools.compress(itertools.count(), map(operator.eq, low, low[span:])):
+        w = low[i]
+        if i < skip or len(w) < 2:
+            continue
+        k = i + 1
+        while k < n and low[k] == w:
+            k += 1
+        skip = k
+        if k - i < REPEAT_RUN_MIN:
+            continue
+        out.append("".join(parts[pos:2 * i + 1]))
+        pos = 2 * k - 1
+    if not out:
+        return s
+    out.append("".join(parts[pos:]))
+    return "".join(out)
+
+def tidy_text(s: str, nfkc: bool = True) -> str:
+    """Nettoyage d'affichage en temps linéaire: aucune expression ne revient en arrière,
+    la fusion des mots répétés se fait au niveau des tokens (_collapse_repeats).
+    nfkc=False: texte déjà NFKC (pages issues de _page_text), pas de seconde passe."""
+    s = s or ""
+    if nfkc:
+        s = unicodedata.normalize("NFKC", s)
+    s = s.translate(_TIDY_DROP)
+    s = _HSPACE_RE.sub(" ", s)
+    s = _DASH_RUN_RE.sub("—", s)
+    s = _collapse_repeats(s)
+    s = _BLANK_LINES_RE.sub("\n\n", s)
     return s.strip()
 
 def simple_summarizer(text: str, max_sentences: int = 3) -> str:
     sentences = re.split(r'(?<=[.!?。？])\s+', (text or "").strip())
     return " ".join(sentences[:max_sentences])
 
+# ---------- Unicode normalization ----------
+_FOLD_PUNCT_RE = re.compile(r"[^a-z0-9\s]")
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+class _FoldTable(dict):
+    """Table str.translate mémoïsée: caractère -> forme de recherche (NFKD -> ASCII -> minuscules,
+    hors [a-z0-9] et espaces -> " "). Calculée une fois par caractère distinct."""
+    def __missing__(self, cp: int) -> str:
+        f = unicodedata.normalize("NFKD", chr(cp)).encode("ascii", "ignore").decode("ascii").lower()
+        f = self[cp] = _FOLD_PUNCT_RE.sub(" ", f)
+        return f
+
+_FOLD = _FoldTable()
+
+def fold_text(s: str) -> str:
+    """Forme de recherche, caractère par caractère (une passe str.translate)."""
+    return (s or "").translate(_FOLD)
+
+class FoldMap:
+    """Offsets texte affiché -> forme repliée. Seuls les caractères dont le repli ne fait pas
+    exactement un caractère sont notés (position + décalage cumulé): vide pour un texte ASCII."""
+    __slots__ = ("pos", "cum")
+
+    def __init__(self, text: str):
+        self.pos, self.cum = array("I"), array("i")
+        shift = 0
+        for m in _NON_ASCII_RE.finditer(text):
+            d = len(_FOLD[ord(m.group())]) - 1
+            if d:
+                shift += d
+                self.pos.append(m.start())
+                self.cum.append(shift)
+
+    def to_folded(self, i: int) -> int:
+        k = bisect.bisect_left(self.pos, i)
+        return i + (self.cum[k - 1] if k else 0)
+
+class NormalizedText:
+    """Normalisation unique à l'ingestion: `text` (affichage: NFKC + tidy), `folded` (recherche,
+    alignée via `fold_map`). L'index et les phrases en découpent des tranches au lieu de re-normaliser."""
+    __slots__ = ("text", "folded", "fold_map")
+
+    def __init__(self, text: str):
+        self.text = text or ""
+        self.folded = fold_text(self.text)
+        self.fold_map = FoldMap(self.text)
+
+    def fold_slice(self, start: int, end: int) -> str:
+        return self.folded[self.fold_map.to_folded(start):self.fold_map.to_folded(end)]
+
 # ---------- Mini-RAG helpers ----------
 def _normalize(s: str) -> str:
-    import unicodedata
-    s = unicodedata.normalize("NFKD", s or "").encode("ascii", "ignore").decode("ascii")
-    s = s.lower()
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return " ".join(fold_text(s).split())
 
 STOPWORDS = set("""
 the a an and or of for to in into with without within over under than that this these those be is are was were been being
@@ -107,49 +557,216 @@ de la le les un une des du au aux et ou dans sur par pour sans sous plus que qui
 est sont etait etaient etre avoir avait avez avons
 """.split())
 
+_PARA_RE = re.compile(r"\S(?:[^\n]*\S)?")  # une ligne non vide, sans ses espaces de bord
+
 def make_chunks(text: str, chunk_chars: int = 1000, overlap: int = 100):
-    paras = [p.strip() for p in text.split("\n") if p.strip()]
-    chunks, cur = [], ""
-    for p in paras:
-        if len(cur) + len(p) + 1 <= chunk_chars:
-            cur = f"{cur}\n{p}".strip()
+    """Découpage en une passe: [(start, end)] = offsets dans `text` (aucune copie de texte).
+    Les lignes non vides sont regroupées tant que le chunk tient dans chunk_chars; le suivant
+    reprend `overlap` caractères avant la fin du précédent (plage partagée)."""
+    chunks = []
+    start = end = None
+    size = 0  # longueur compactée (lignes jointes par "\n", sans lignes vides)
+    for m in _PARA_RE.finditer(text):
+        a, b = m.span()
+        if start is None:
+            start, end, size = a, b, b - a
+        elif size + (b - a) + 1 <= chunk_chars:
+            end = b
+            size += (b - a) + 1
         else:
-            if cur:
-                chunks.append(cur)
-            tail = cur[-overlap:] if cur else ""
-            cur = (tail + "\n" + p).strip()
-    if cur:
-        chunks.append(cur)
-    return [{"text": c, "norm": _normalize(c)} for c in chunks]
+            chunks.append((start, end))
+            tail = max(start, end - overlap)
+            while text[tail].isspace():
+                tail += 1
+            start, end, size = tail, b, (end - tail) + 1 + (b - a)
+    if start is not None:
+        chunks.append((start, end))
+    return chunks
+
+FUZZY_RATIO = 0.84
 
 def _fuzzy_hit(word: str, token: str) -> bool:
     if abs(len(word) - len(token)) > 2:
         return False
-    return SequenceMatcher(None, word, token).ratio() >= 0.84
-
-def score_chunk(norm_chunk: str, norm_query: str) -> float:
-    c_tokens = norm_chunk.split()
-    q_tokens = [w for w in norm_query.split() if w not in STOPWORDS and len(w) > 2]
-    if not q_tokens:
-        return 0.0
-    score = 0.0
-    for w in q_tokens:
-        exact = c_tokens.count(w)
-        if exact:
-            score += exact * 1.0
-        else:
-            if any(_fuzzy_hit(w, t) for t in c_tokens):
-                score += 0.7
+    return SequenceMatcher(None, word, token).ratio() >= FUZZY_RATIO
+
+# ---------- Fuzzy vocabulary index ----------
+def _bigrams(s: str):
+    return [s[i:i + 2] for i in range(len(s) - 1)]
+
+def build_gram_index(terms) -> dict:
+    """Index bigramme -> ids de termes (+ ids par longueur), construit une fois par document.
+    Les ids sont les positions dans `terms` (liste triée), stockés en array('I')."""
+    terms = terms if isinstance(terms, list) else sorted(terms)
+    grams, by_len = {}, {}
+    for i, t in enumerate(terms):
+        by_len.setdefault(len(t), array("I")).append(i)
+        for g in set(_bigrams(t)):
+            grams.setdefault(g, array("I")).append(i)
+    return {"terms": terms, "grams": grams, "by_len": by_len}
+
+def _min_shared_bigrams(la: int) -> int:
+    """Borne basse de bigrammes communs pour ratio >= FUZZY_RATIO (|la - lb| <= 2), 0 si pas de borne.
+    Sous-séquence commune M: au moins 3M - 1 - la - lb bigrammes contigus dans les deux mots."""
+    bound = None
+    for lb in range(max(1, la - 2), la + 3):
+        m = next((m for m in range(min(la, lb) + 1) if 2.0 * m / (la + lb) >= FUZZY_RATIO), None)
+        if m is None:
+            continue  # longueur impossible
+        t = 3 * m - 1 - la - lb
+        bound = t if bound is None else min(bound, t)
+    return max(0, bound or 0)
+
+def fuzzy_terms(gram_index: dict, w: str):
+    """Termes t du vocabulaire avec _fuzzy_hit(w, t), sans balayer tout le vocabulaire.
+    Filtre par préfixe: si >= T bigrammes doivent être partagés, l'un des (q - T + 1) plus rares l'est."""
+    terms, grams = gram_index["terms"], gram_index["grams"]
+    q = _bigrams(w)
+    need = _min_shared_bigrams(len(w))
+    if need <= 0 or not q:
+        cands = [i for n in range(len(w) - 2, len(w) + 3) for i in gram_index["by_len"].get(n, ())]
+    else:
+        q.sort(key=lambda g: len(grams.get(g, ())))
+        cands = {i for g in q[:len(q) - need + 1] for i in grams.get(g, ())}
+    return [terms[i] for i in cands if _fuzzy_hit(w, terms[i])]
+
+def substring_terms(gram_index: dict, w: str):
+    """Termes contenant w (via son bigramme le plus rare)."""
+    terms, grams = gram_index["terms"], gram_index["grams"]
+    q = _bigrams(w)
+    if not q:
+        return []
+    rarest = min(q, key=lambda g: len(grams.get(g, ())))
+    return [terms[i] for i in grams.get(rarest, ()) if w in terms[i]]
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+FUZZY_WEIGHT = 0.7      # terme proche (faute de frappe)
+SUBSTRING_WEIGHT = 0.3  # mot long contenu dans un terme (invest -> investments)
+
+def _packed(values) -> array:
+    """array('H') si toutes les valeurs tiennent sur 16 bits, sinon array('I')."""
+    a = array("I", values)
+    return array("H", a) if not a or max(a) < 65536 else a
+
+class CompactDoc:
+    """Entrée DOC_STORE compacte: __slots__ et tableaux typés au lieu de dicts / tuples par chunk.
+    Chunks = offsets starts/ends dans `text`; vocabulaire trié propre au document (id de terme = rang);
+    postings en CSR: les chunks du terme t sont post_cid[post_off[t]:post_off[t + 1]], tf alignés dans post_tf
+    (16 bits quand les valeurs le permettent)."""
+    __slots__ = ("text", "pages", "words", "fingerprint", "starts", "ends", "lens", "avgdl",
+                 "terms", "post_off", "post_cid", "post_tf", "vocab", "_nbytes")
+
+    def __init__(self, text: str, pages: int, words: int, fingerprint: str = None):
+        self.text = text
+        self.pages = pages
+        self.words = words
+        self.fingerprint = fingerprint or _doc_hash(text)
+        spans = make_chunks(text)
+        self.starts = array("I", (a for a, _ in spans))
+        self.ends = array("I", (b for _, b in spans))
+        # Index inversé depuis la forme repliée de chaque chunk (tranche de la normalisation unique)
+        nt = NormalizedText(text)
+        postings = {}
+        lens = []
+        for cid, (a, b) in enumerate(spans):
+            tokens = nt.fold_slice(a, b).split()
+            lens.append(len(tokens))
+            tf = {}
+            for t in tokens:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                postings.setdefault(t, []).append((cid, n))
+        self.lens = _packed(lens)
+        self.avgdl = (sum(lens) / len(lens)) if lens else 0.0
+        self.terms = sorted(postings)
+        self.post_off, post_cid, post_tf = array("I", [0]), [], []
+        for t in self.terms:
+            for cid, n in postings[t]:
+                post_cid.append(cid)
+                post_tf.append(n)
+            self.post_off.append(len(post_cid))
+        self.post_cid, self.post_tf = _packed(post_cid), _packed(post_tf)
+        self.vocab = build_gram_index(self.terms)
+        self._nbytes = None
+
+    @property
+    def n_chunks(self) -> int:
+        return len(self.starts)
+
+    def chunk_text(self, cid: int) -> str:
+        """Matérialise le texte d'un chunk à la demande."""
+        return self.text[self.starts[cid]:self.ends[cid]]
+
+    def term_id(self, t: str) -> int:
+        i = bisect.bisect_left(self.terms, t)
+        return i if i < len(self.terms) and self.terms[i] == t else -1
+
+    def memory_report(self) -> dict:
+        """Octets mesurés (sys.getsizeof) par composant."""
+        size = sys.getsizeof
+        grams, by_len = self.vocab["grams"], self.vocab["by_len"]
+        return {
+            "text": size(self.text),
+            "chunks": size(self.starts) + size(self.ends) + size(self.lens),
+            "postings": size(self.post_off) + size(self.post_cid) + size(self.post_tf),
+            "terms": size(self.terms) + sum(size(t) for t in self.terms),
+            "grams": size(grams) + sum(size(g) + size(ids) for g, ids in grams.items())
+                     + size(by_len) + sum(size(ids) for ids in by_len.values()),
+            "object": size(self) + size(self.fingerprint) + size(self.vocab),
+        }
+
+    def nbytes(self) -> int:
+        if self._nbytes is None:
+            self._nbytes = sum(self.memory_report().values())
+        return self._nbytes
+
+def _query_terms(question: str):
+    return [w for w in _normalize(question).split() if w not in STOPWORDS and len(w) > 2]
+
+def _expand_term(doc: CompactDoc, w: str):
+    """Termes du vocabulaire à scorer pour un mot de la question: [(id de terme, poids)]."""
+    tid = doc.term_id(w)
+    if tid >= 0:
+        terms = [(tid, 1.0)]
+    else:
+        terms = [(doc.term_id(t), FUZZY_WEIGHT) for t in fuzzy_terms(doc.vocab, w)]
+    if len(w) >= 7:
+        terms += [(doc.term_id(t), SUBSTRING_WEIGHT) for t in substring_terms(doc.vocab, w) if t != w]
+    return terms
+
+def bm25_scores(doc: CompactDoc, q_tokens) -> dict:
+    """BM25 sur les postings des termes de la question: {chunk_id: score} (chunks touchés uniquement).
+    Pour chaque mot, un chunk garde la meilleure contribution parmi ses variantes (exact / fuzzy / sous-chaîne)."""
+    post_off, post_cid, post_tf, lens = doc.post_off, doc.post_cid, doc.post_tf, doc.lens
+    n, avgdl = len(lens), doc.avgdl or 1.0
+    scores = {}
     for w in q_tokens:
-        if len(w) >= 7 and w in norm_chunk:
-            score += 0.3
-    return score
-
-def select_passages(text: str, question: str, k: int = 6, max_chars: int = 10000) -> str:
-    chunks = make_chunks(text, chunk_chars=1000, overlap=100)
-    qn = _normalize(question)
-    ranked = sorted(chunks, key=lambda ch: score_chunk(ch["norm"], qn), reverse=True)[:max(1, k)]
-    ctx = "\n\n---\n\n".join(ch["text"] for ch in ranked)
+        best = {}
+        for tid, weight in _expand_term(doc, w):
+            lo, hi = post_off[tid], post_off[tid + 1]
+            df = hi - lo
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            for cid, tf in zip(post_cid[lo:hi], post_tf[lo:hi]):
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lens[cid] / avgdl)
+                sc = weight * idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+                if sc > best.get(cid, 0.0):
+                    best[cid] = sc
+        for cid, sc in best.items():
+            scores[cid] = scores.get(cid, 0.0) + sc
+    return scores
+
+def select_passages(doc: CompactDoc, question: str, k: int = 6, max_chars: int = 10000) -> str:
+    n = doc.n_chunks
+    k = max(1, k)
+    q_tokens = _query_terms(question)
+    scores = bm25_scores(doc, q_tokens) if q_tokens else {}
+    ranked = [cid for cid, _ in heapq.nlargest(k, scores.items(), key=lambda kv: (kv[1], -kv[0]))]
+    if len(ranked) < k:
+        # Pas assez de chunks pertinents: complète dans l'ordre du document
+        seen = set(ranked)
+        ranked += [i for i in range(n) if i not in seen][:k - len(ranked)]
+    ctx = "\n\n---\n\n".join(doc.chunk_text(i) for i in ranked)
     return ctx[:max_chars]
 
 # ---------- Local (no-LLM) fallbacks ----------
@@ -182,63 +799,647 @@ def local_summary_markdown(text: str, bullets: int = 6) -> str:
     md.append("**Recommendations**\n\n- (Not available in offline mode)")
     return "\n\n".join(md).strip()
 
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?。？])\s+')
+
 def local_qa_answer(context: str, question: str) -> str:
     """Réponse locale: renvoie le meilleur extrait aligné + petite explication."""
     # Cherche les phrases contenant les mots de la question
-    qn = _normalize(question)
-    qtokens = [w for w in qn.split() if w not in STOPWORDS and len(w) > 2]
-    sents = re.split(r'(?<=[.!?。？])\s+', context)
-    def s_score(s):
-        sn = _normalize(s)
+    qtokens = _query_terms(question)
+    # Un seul repli du contexte; chaque phrase en découpe sa tranche
+    ctx = NormalizedText(context)
+    spans, start = [], 0
+    for m in _SENT_SPLIT_RE.finditer(context):
+        spans.append((start, m.start()))
+        start = m.end()
+    spans.append((start, len(context)))
+    sents = [context[a:b] for a, b in spans]
+    norms = [ctx.fold_slice(a, b) for a, b in spans]
+    # Variantes fuzzy calculées une fois sur le vocabulaire du contexte (pas par phrase)
+    vocab = build_gram_index({t for sn in norms for t in sn.split()})
+    variants = {w: set(fuzzy_terms(vocab, w)) for w in qtokens}
+    def s_score(i):
+        sn = norms[i]
+        toks = None
         sc = 0.0
         for w in qtokens:
             if w in sn:
                 sc += 1.0
             else:
-                if any(_fuzzy_hit(w, t) for t in sn.split()):
+                toks = toks if toks is not None else set(sn.split())
+                if variants[w] & toks:
                     sc += 0.7
         return sc
-    best = sorted(sents, key=s_score, reverse=True)[:3]
-    if best and sum(s_score(x) for x in best) > 0:
+    scores = [s_score(i) for i in range(len(sents))]
+    best = [sents[i] for i in sorted(range(len(sents)), key=lambda i: scores[i], reverse=True)[:3]]
+    if best and sum(sorted(scores, reverse=True)[:3]) > 0:
         quote = " ".join(best).strip()
         return f"From the provided passages, most relevant snippet is:\n\n> …{quote}…\n\nThis is a local answer (offline mode)."
     return "I cannot confidently find the answer in the provided passages (offline mode)."
 
+# ---------- Groq client (shared) ----------
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "64"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "0"))  # 429: géré par RATE_SCHEDULER + modèle suivant
+_GROQ_CLIENTS = {}  # api_key -> AsyncOpenAI
+_GROQ_CLIENTS_LOCK = threading.Lock()
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (extra optionnel: httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+def _groq_client(api_key: str):
+    """Client OpenAI-compatible partagé par processus, créé à la première utilisation:
+    pool de connexions keep-alive, timeouts connect/read explicites, HTTP/2 si `h2` est installé."""
+    client = _GROQ_CLIENTS.get(api_key)
+    if client is not None:
+        return client
+    with _GROQ_CLIENTS_LOCK:
+        client = _GROQ_CLIENTS.get(api_key)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            )
+            timeout = httpx.Timeout(GROQ_READ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+            http2 = _http2_available()
+            http_client = openai.DefaultAsyncHttpxClient(limits=limits, timeout=timeout, http2=http2)
+            client = openai.AsyncOpenAI(
+                api_key=api_key, base_url=GROQ_BASE_URL, http_client=http_client,
+                timeout=timeout, max_retries=GROQ_MAX_RETRIES,
+            )
+            _GROQ_CLIENTS[api_key] = client
+    return client
+
+# ---------- Groq rate limits ----------
+RATE_MAX_WAIT_SECONDS = float(os.getenv("RATE_MAX_WAIT_SECONDS", "2"))
+
+def _parse_reset(value) -> float:
+    """Durée Groq ("7.66s", "2m59.56s", "1h2m", "250ms") -> secondes; 0 si absente/illisible."""
+    total = 0.0
+    for num, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", str(value or "")):
+        total += float(num) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+def _error_headers(e: Exception):
+    response = getattr(e, "response", None)
+    return getattr(response, "headers", None) or {}
+
+def _estimate_tokens(messages, max_tokens: int) -> int:
+    # ~4 caractères par token + complétion maximale
+    return sum(len(m.get("content") or "") for m in messages) // 4 + max_tokens
+
+class RateScheduler:
+    """Seaux requêtes / tokens par modèle, recalés sur les en-têtes x-ratelimit-* et retry-after de Groq.
+    Les envois réservent localement leur budget; reserve() renvoie l'attente nécessaire (0 = envoyer)."""
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.paced = self.skipped = self.limited = 0
+
+    def _state(self, model: str) -> dict:
+        st = self._models.get(model)
+        if st is None:
+            st = self._models[model] = {
+                "requests_left": None, "requests_limit": None, "requests_reset": 0.0,
+                "tokens_left": None, "tokens_limit": None, "tokens_reset": 0.0,
+                "blocked_until": 0.0,
+            }
+        return st
+
+    def reserve(self, model: str, tokens: int) -> float:
+        now = time()
+        with self._lock:
+            st = self._state(model)
+            # Fenêtre écoulée: le seau repart de la limite connue (ou redevient inconnu)
+            if st["requests_reset"] and now >= st["requests_reset"]:
+                st["requests_left"], st["requests_reset"] = st["requests_limit"], 0.0
+            if st["tokens_reset"] and now >= st["tokens_reset"]:
+                st["tokens_left"], st["tokens_reset"] = st["tokens_limit"], 0.0
+            wait = st["blocked_until"] - now
+            if st["requests_left"] is not None and st["requests_left"] < 1:
+                wait = max(wait, st["requests_reset"] - now)
+            if st["tokens_left"] is not None and st["tokens_left"] < tokens:
+                wait = max(wait, st["tokens_reset"] - now)
+            if wait > 0:
+                return wait
+            if st["requests_left"] is not None:
+                st["requests_left"] -= 1
+            if st["tokens_left"] is not None:
+                st["tokens_left"] -= tokens
+            return 0.0
+
+    def update(self, model: str, headers):
+        """Recale les seaux sur les en-têtes d'une réponse."""
+        now = time()
+        with self._lock:
+            st = self._state(model)
+            for kind in ("requests", "tokens"):
+                left = headers.get(f"x-ratelimit-remaining-{kind}")
+                if left is None:
+                    continue
+                try:
+                    st[f"{kind}_left"] = int(float(left))
+                    st[f"{kind}_limit"] = int(float(headers.get(f"x-ratelimit-limit-{kind}") or 0)) or None
+                except ValueError:
+                    continue
+                st[f"{kind}_reset"] = now + _parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+
+    def on_rate_limited(self, model: str, headers):
+        """429 reçu: bloque le modèle jusqu'à retry-after (1 s par défaut)."""
+        self.update(model, headers)
+        try:
+            retry = float(headers.get("retry-after") or 0) or 1.0
+        except ValueError:
+            retry = _parse_reset(headers.get("retry-after")) or 1.0
+        with self._lock:
+            self.limited += 1
+            st = self._state(model)
+            st["blocked_until"] = max(st["blocked_until"], time() + retry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "paced": self.paced, "skipped": self.skipped, "limited": self.limited,
+                "models": {m: dict(st) for m, st in self._models.items()},
+            }
+
+RATE_SCHEDULER = RateScheduler()
+
+async def _pace_async(model: str, tokens: int, last: bool = True) -> bool:
+    while True:
+        wait = RATE_SCHEDULER.reserve(model, tokens)
+        if wait <= 0:
+            return True
+        if not last or wait > RATE_MAX_WAIT_SECONDS:
+            RATE_SCHEDULER.skipped += 1
+            return False
+        RATE_SCHEDULER.paced += 1
+        await asyncio.sleep(wait)
+
+# ---------- Circuit breaker ----------
+CB_FAILURE_THRESHOLD = int(os.getenv("CB_FAILURE_THRESHOLD", "3"))
+CB_COOLDOWN_SECONDS = float(os.getenv("CB_COOLDOWN_SECONDS", "30"))
+CB_MAX_COOLDOWN_SECONDS = float(os.getenv("CB_MAX_COOLDOWN_SECONDS", "300"))
+
+class LLMUnavailable(RuntimeError):
+    """Aucun modèle joignable (circuits ouverts, timeouts, 5xx, rate-limit): passer au fallback local."""
+
+def _is_transient_error(e: Exception) -> bool:
+    return _is_rate_limit_error(e) or isinstance(
+        e, (LLMUnavailable, openai.APIConnectionError, openai.InternalServerError, httpx.TransportError, asyncio.TimeoutError)
+    )
+
+def _use_local_fallback(e: Exception) -> bool:
+    return isinstance(e, LLMUnavailable) or _is_rate_limit_error(e)
+
+class CircuitBreaker:
+    """Disjoncteur par modèle (closed -> open -> half_open), servant aussi de cache négatif:
+    après CB_FAILURE_THRESHOLD échecs transitoires consécutifs, le modèle est ignoré pendant
+    le cool-down (doublé à chaque sonde ratée), puis une seule requête sonde le rétablissement."""
+
+    def __init__(self, threshold: int, cooldown: float, max_cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._models = {}
+        self._lock = threading.Lock()
+        self.short_circuited = 0
+
+    def _state(self, model: str) -> dict:
+        st = self._models.get(model)
+        if st is None:
+            st = self._models[model] = {
+                "state": "closed", "failures": 0, "open_until": 0.0,
+                "cooldown": self.cooldown, "probe_at": 0.0, "trips": 0,
+            }
+        return st
+
+    def allow(self, model: str) -> bool:
+        now = time()
+        with self._lock:
+            st = self._state(model)
+            if st["state"] == "closed":
+                return True
+            if st["state"] == "open" and now >= st["open_until"]:
+                st["state"] = "half_open"
+            # half_open: une seule sonde à la fois (expire si elle n'a jamais rendu compte)
+            if st["state"] == "half_open" and now - st["probe_at"] > GROQ_CONNECT_TIMEOUT + GROQ_READ_TIMEOUT:
+                st["probe_at"] = now
+                return True
+            self.short_circuited += 1
+            return False
+
+    def state(self, model: str) -> str:
+        with self._lock:
+            st = self._models.get(model)
+            return st["state"] if st else "closed"
+
+    def release(self, model: str):
+        """La sonde accordée n'a pas été envoyée, ou son essai a été annulé sans résultat."""
+        with self._lock:
+            self._state(model)["probe_at"] = 0.0
+
+    def success(self, model: str):
+        with self._lock:
+            st = self._state(model)
+            st.update(state="closed", failures=0, cooldown=self.cooldown, probe_at=0.0)
+
+    def failure(self, model: str, cooldown: float = 0.0):
+        now = time()
+        with self._lock:
+            st = self._state(model)
+            st["failures"] += 1
+            if st["state"] == "half_open":
+                st["cooldown"] = min(st["cooldown"] * 2, self.max_cooldown)
+            elif st["failures"] < self.threshold:
+                return
+            st.update(state="open", open_until=now + max(st["cooldown"], cooldown), probe_at=0.0)
+            st["trips"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "short_circuited": self.short_circuited,
+                "models": {m: dict(st) for m, st in self._models.items()},
+            }
+
+BREAKER = CircuitBreaker(CB_FAILURE_THRESHOLD, CB_COOLDOWN_SECONDS, CB_MAX_COOLDOWN_SECONDS)
+
+def _record_failure(model: str, e: Exception):
+    if _is_rate_limit_error(e):
+        headers = _error_headers(e)
+        RATE_SCHEDULER.on_rate_limited(model, headers)
+        try:
+            retry = float(headers.get("retry-after") or 0)
+        except ValueError:
+            retry = _parse_reset(headers.get("retry-after"))
+        BREAKER.failure(model, retry)
+    else:
+        BREAKER.failure(model)
+    ROUTER.record(model, False)
+
+# ---------- Latency histograms / hedging ----------
+GROQ_HEDGE = os.getenv("GROQ_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.1"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "1000"))
+
+class LatencyHistogram:
+    """Histogramme log-linéaire des latences réussies d'un modèle (seaux ×1.25 de 10 ms à ~2 min).
+    Les comptes sont divisés par deux à chaque LATENCY_WINDOW échantillons: les percentiles suivent la charge récente."""
+    BOUNDS = [0.01 * 1.25 ** i for i in range(43)]
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.n = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+            self.n += 1
+            self.total += 1
+            if self.n >= self.window:
+                self.counts = [c // 2 for c in self.counts]
+                self.n = sum(self.counts)
+
+    def percentile(self, q: float):
+        """Borne haute du seau contenant le q-quantile; None sans échantillon."""
+        with self._lock:
+            if not self.n:
+                return None
+            target, cum = q * self.n, 0
+            for i, c in enumerate(self.counts):
+                cum += c
+                if cum >= target:
+                    return self.BOUNDS[min(i, len(self.BOUNDS) - 1)]
+            return self.BOUNDS[-1]
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.total,
+            **{f"p{int(q * 100)}": self.percentile(q) for q in (0.5, 0.9, 0.99)},
+        }
+
+LATENCY = {}  # (modèle, tâche) -> histogramme: un résumé (450 tokens) ne fausse pas le p90 des Q&A
+HEDGE_STATS = {"hedged": 0, "fallback_wins": 0}
+
+def _latency(model: str, task: str = None) -> LatencyHistogram:
+    key = (model, task or "other")
+    hist = LATENCY.get(key)
+    if hist is None:
+        hist = LATENCY.setdefault(key, LatencyHistogram())
+    return hist
+
+def _latency_stats() -> dict:
+    out = {}
+    for (m, task), h in list(LATENCY.items()):
+        out.setdefault(m, {})[task] = h.stats()
+    return out
+
+def _hedge_delay(model: str, task: str = None) -> float:
+    hist = _latency(model, task)
+    if hist.n < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, hist.percentile(HEDGE_PERCENTILE))
+
+# ---------- Adaptive model routing ----------
+GROQ_ROUTING = os.getenv("GROQ_ROUTING", "0") == "1"
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "100"))
+ROUTER_WINDOW_SECONDS = float(os.getenv("ROUTER_WINDOW_SECONDS", "300"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+ROUTER_EXPLORE = float(os.getenv("ROUTER_EXPLORE", "0.05"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_SUMMARY_SLO_SECONDS = float(os.getenv("ROUTER_SUMMARY_SLO_SECONDS", "10"))
+# Politique par tâche: "fastest" (latence p50 minimale) ou "capable" (premier de GROQ_MODELS dont le p90 tient le SLO)
+ROUTER_POLICIES = {"qa": "fastest", "summary": "capable"}
+
+def _configured_models():
+    """GROQ_MODELS (du plus capable au plus léger), sinon GROQ_MODEL + GROQ_MODEL_FALLBACK."""
+    models = [m.strip() for m in os.getenv("GROQ_MODELS", "").split(",") if m.strip()]
+    if not models:
+        models = [os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")]
+        fallback = os.getenv("GROQ_MODEL_FALLBACK", "").strip()
+        if fallback and fallback != models[0]:
+            models.append(fallback)
+    return list(dict.fromkeys(models))
+
+class ModelRouter:
+    """Fenêtre glissante (ROUTER_WINDOW appels, ROUTER_WINDOW_SECONDS au plus) de latence, taux d'erreur
+    et débit de tokens par modèle; ordonne les modèles candidats d'une requête selon la politique de sa tâche.
+    Les appels trop anciens sortent de la fenêtre: un modèle écarté pour ses erreurs redevient candidat."""
+
+    def __init__(self, window: int = ROUTER_WINDOW, max_age: float = ROUTER_WINDOW_SECONDS):
+        self.window = window
+        self.max_age = max_age
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.decisions = {}
+        self.recent = deque(maxlen=50)
+
+    def record(self, model: str, ok: bool, seconds: float = None, tokens: int = 0):
+        with self._lock:
+            calls = self._calls.get(model)
+            if calls is None:
+                calls = self._calls[model] = deque(maxlen=self.window)
+            calls.append((time(), ok, seconds, tokens))
+
+    def model_stats(self, model: str) -> dict:
+        horizon = time() - self.max_age
+        with self._lock:
+            window = self._calls.get(model, ())
+            while window and window[0][0] < horizon:
+                window.popleft()
+            calls = [c[1:] for c in window]
+        timed = sorted(sec for ok, sec, _ in calls if ok and sec is not None)
+        busy = sum(sec for ok, sec, tok in calls if ok and sec and tok)
+        pick = lambda q: timed[min(len(timed) - 1, int(q * len(timed)))] if timed else None
+        return {
+            "calls": len(calls),
+            "samples": len(timed),
+            "error_rate": (sum(1 for ok, _, _ in calls if not ok) / len(calls)) if calls else 0.0,
+            "p50": pick(0.5),
+            "p90": pick(0.9),
+            "tokens_per_s": (sum(tok for ok, sec, tok in calls if ok and sec and tok) / busy) if busy else None,
+            "circuit": BREAKER.state(model),
+        }
+
+    def route(self, task: str, models: list) -> list:
+        """Renvoie `models` réordonnés: le choix de la politique en tête, les autres en repli."""
+        policy = ROUTER_POLICIES.get(task)
+        if not policy or len(models) < 2:
+            return models
+        stats = {m: self.model_stats(m) for m in models}
+        healthy = [m for m in models if stats[m]["circuit"] != "open" and stats[m]["error_rate"] <= ROUTER_MAX_ERROR_RATE]
+        measured = [m for m in healthy if stats[m]["samples"] >= ROUTER_MIN_SAMPLES]
+        unmeasured = [m for m in healthy if m not in measured]
+        # Exploration: modèles non retenus, y compris ceux écartés pour leur taux d'erreur (circuit non ouvert)
+        explorable = [m for m in models if stats[m]["circuit"] != "open"]
+        choice, reason = None, policy
+        if unmeasured:
+            # Mise en route: chaque modèle sain reçoit ROUTER_MIN_SAMPLES appels avant d'être comparé
+            choice, reason = min(unmeasured, key=lambda m: stats[m]["samples"]), "warmup"
+        elif len(explorable) > 1 and random.random() < ROUTER_EXPLORE:
+            # Exploration: garde à jour la fenêtre des modèles non retenus
+            choice, reason = random.choice(explorable), "explore"
+        elif policy == "fastest" and measured:
+            choice = min(measured, key=lambda m: stats[m]["p50"])
+        elif policy == "capable" and measured:
+            within = [m for m in measured if stats[m]["p90"] <= ROUTER_SUMMARY_SLO_SECONDS]
+            if within:
+                choice = within[0]
+            else:
+                choice, reason = min(measured, key=lambda m: stats[m]["p90"]), "capable_over_slo"
+        if choice is None:
+            return models
+        with self._lock:
+            per_task = self.decisions.setdefault(task, {})
+            per_task[choice] = per_task.get(choice, 0) + 1
+            self.recent.append({"ts": time(), "task": task, "model": choice, "reason": reason})
+        return [choice] + [m for m in models if m != choice]
+
+    def stats(self) -> dict:
+        with self._lock:
+            decisions = {t: dict(d) for t, d in self.decisions.items()}
+            recent = list(self.recent)
+        return {
+            "enabled": GROQ_ROUTING,
+            "policies": ROUTER_POLICIES,
+            "models": {m: self.model_stats(m) for m in _configured_models()},
+            "decisions": decisions,
+            "recent": recent,
+        }
+
+ROUTER = ModelRouter()
+
+def _record_success(model: str, seconds: float = None, resp=None, tokens: int = 0, task: str = None):
+    BREAKER.success(model)
+    if seconds is not None:
+        _latency(model, task).record(seconds)
+    usage = getattr(resp, "usage", None)
+    ROUTER.record(model, True, seconds, getattr(usage, "completion_tokens", 0) or tokens)
+
 # ---------- Groq chat with fallback ----------
-def _groq_chat(messages, max_tokens, temperature=0.2, model=None):
-    import openai
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "32"))
+_LLM_SEMAPHORE = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_MODEL_SEMAPHORES = {}
+
+def _model_candidates(model=None, task=None):
+    if model:
+        fallback = os.getenv("GROQ_MODEL_FALLBACK", "").strip()
+        return [model] + ([fallback] if fallback and fallback != model else [])
+    models = _configured_models()
+    return ROUTER.route(task, models) if GROQ_ROUTING and task else models
+
+@asynccontextmanager
+async def _llm_slot(model: str):
+    """Limite les appels LLM en vol par worker (global) et par modèle."""
+    sem = _MODEL_SEMAPHORES.get(model)
+    if sem is None:
+        sem = _MODEL_SEMAPHORES[model] = asyncio.Semaphore(LLM_MAX_CONCURRENCY_PER_MODEL)
+    async with _LLM_SEMAPHORE, sem:
+        yield
+
+async def _chat_attempt_async(client, m, messages, max_tokens, temperature, est, last, task=None):
+    """Un essai sur un modèle: disjoncteur, budget, sémaphores, en-têtes et latence (par tâche)."""
+    if not BREAKER.allow(m):
+        raise LLMUnavailable(f"circuit open for {m}")
+    try:
+        if not await _pace_async(m, est, last):
+            raise LLMUnavailable(f"rate limit budget exhausted for {m} (client-side scheduler)")
+        async with _llm_slot(m):
+            t0 = perf_counter()
+            raw = await client.chat.completions.with_raw_response.create(
+                model=m,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+            elapsed = perf_counter() - t0
+    except (asyncio.CancelledError, LLMUnavailable):
+        # Sauté faute de budget, ou annulé (hedge perdant, client parti): sans verdict, la sonde est rendue
+        BREAKER.release(m)
+        raise
+    except Exception as e:
+        if _is_transient_error(e):
+            _record_failure(m, e)
+        else:
+            BREAKER.success(m)
+        raise
+    RATE_SCHEDULER.update(m, raw.headers)
+    resp = raw.parse()
+    _record_success(m, elapsed, resp, task=task)
+    return resp
+
+async def _groq_chat_async(messages, max_tokens, temperature=0.2, model=None, hedge=False, task=None):
+    """Appel chat (AsyncOpenAI) sur les modèles candidats, sous sémaphores global + par modèle.
+    hedge=True: si le modèle principal n'a pas répondu après son p90 (HEDGE_PERCENTILE),
+    la même requête part sur le fallback; la première réponse gagne, l'autre est annulée."""
     api_key = os.environ.get("GROQ_API_KEY", "")
     if not api_key:
         raise RuntimeError("No GROQ_API_KEY")
-    client = openai.OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
+    client = _groq_client(api_key)
+    est = _estimate_tokens(messages, max_tokens)
+    candidates = _model_candidates(model, task)
+
+    async def attempt(m, last):
+        return m, await _chat_attempt_async(client, m, messages, max_tokens, temperature, est, last, task)
+
+    if hedge and len(candidates) > 1:
+        primary, backup = candidates[:2]
+        tasks = [asyncio.ensure_future(attempt(primary, False))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=_hedge_delay(primary, task))
+            hedged = not done
+            if hedged:
+                HEDGE_STATS["hedged"] += 1
+                tasks.append(asyncio.ensure_future(attempt(backup, True)))
+            elif tasks[0].exception() is not None and _is_transient_error(tasks[0].exception()):
+                tasks.append(asyncio.ensure_future(attempt(backup, True)))
+            last_err = None
+            for fut in asyncio.as_completed(tasks):
+                try:
+                    m, resp = await fut
+                except Exception as e:
+                    if not _is_transient_error(e):
+                        raise RuntimeError(f"Groq call failed (tried {candidates[:len(tasks)]}): {e}")
+                    last_err = e
+                    continue
+                if hedged and m == backup:
+                    HEDGE_STATS["fallback_wins"] += 1
+                return resp
+            raise LLMUnavailable(f"Groq call failed (tried {candidates[:len(tasks)]}): {last_err}")
+        finally:
+            for t in tasks:
+                t.cancel()
 
-    primary = model or os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
-    fallback = os.getenv("GROQ_MODEL_FALLBACK", "").strip()
     tried = []
     last_err = None
-    for m in [primary] + ([fallback] if fallback and fallback != primary else []):
+    for i, m in enumerate(candidates):
         tried.append(m)
         try:
-            return client.chat.completions.create(
-                model=m,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-            )
+            return (await attempt(m, i == len(candidates) - 1))[1]
         except Exception as e:
             last_err = e
-            if _is_rate_limit_error(e):
-                # on tente le modèle suivant
-                continue
-            break
-    raise RuntimeError(f"Groq call failed (tried {tried}): {last_err}")
+            if not _is_transient_error(e):
+                raise RuntimeError(f"Groq call failed (tried {tried}): {e}")
+            # on tente le modèle suivant
+    raise LLMUnavailable(f"Groq call failed (tried {tried}): {last_err}")
 
-# ---------- LLM calls ----------
-def smart_groq_summary_structured(text: str):
-    """JSON strict -> MD ; si rate-limit -> résumé local."""
-    if not os.environ.get("GROQ_API_KEY", ""):
-        return "[Groq Error] No API key defined", None
+async def _groq_stream_async(messages, max_tokens, temperature=0.2, model=None, task=None):
+    """Streaming (stream=True): produit les fragments de texte au fil des tokens.
+    Bascule sur le modèle suivant seulement si l'erreur transitoire survient avant le premier fragment."""
+    api_key = os.environ.get("GROQ_API_KEY", "")
+    if not api_key:
+        raise RuntimeError("No GROQ_API_KEY")
+    client = _groq_client(api_key)
+    est = _estimate_tokens(messages, max_tokens)
+
+    tried = []
+    last_err = None
+    candidates = _model_candidates(model, task)
+    for i, m in enumerate(candidates):
+        tried.append(m)
+        last = i == len(candidates) - 1
+        if not BREAKER.allow(m):
+            last_err = LLMUnavailable(f"circuit open for {m}")
+            continue
+        started = False
+        pieces = 0
+        try:
+            if not await _pace_async(m, est, last):
+                BREAKER.release(m)
+                last_err = RuntimeError(f"rate limit budget exhausted for {m} (client-side scheduler)")
+                continue
+            async with _llm_slot(m):
+                t0 = perf_counter()
+                raw = await client.chat.completions.with_raw_response.create(
+                    model=m,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                )
+                RATE_SCHEDULER.update(m, raw.headers)
+                async for chunk in raw.parse():
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        started = True
+                        pieces += 1
+                        yield delta
+                elapsed = perf_counter() - t0
+            # ~1 fragment par token; latence = durée complète, comparable aux appels non streamés
+            _record_success(m, elapsed, tokens=pieces, task=task)
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            BREAKER.release(m)  # lecteur parti ou tâche annulée: ni succès ni échec
+            raise
+        except Exception as e:
+            last_err = e
+            if not _is_transient_error(e):
+                BREAKER.success(m)
+                if started:
+                    raise
+                raise RuntimeError(f"Groq call failed (tried {tried}): {e}")
+            _record_failure(m, e)
+            if started:
+                raise
+    raise LLMUnavailable(f"Groq call failed (tried {tried}): {last_err}")
 
+# ---------- LLM prompts ----------
+def _summary_structured_messages(text: str):
     head = (text or "")[:4500]
     sys = (
         "You are an expert summarizer. Respond ONLY with a valid JSON object and nothing else. "
@@ -250,38 +1451,87 @@ def smart_groq_summary_structured(text: str):
         "Use short bullet items in arrays. No markdown, ONLY JSON.\n\n"
         f"PDF content:\n{head}"
     )
-    try:
-        resp = _groq_chat(
-            messages=[{"role": "system", "content": sys}, {"role": "user", "content": user}],
-            max_tokens=450,
-            temperature=0.2,
-        )
-        raw = (resp.choices[0].message.content or "").strip()
-        raw = raw.strip("` \n")
-        if raw.startswith("json"):
-            raw = raw[4:].strip()
-        data = json.loads(raw)
-        md = []
-        if data.get("executive_summary"):
-            md.append("**Executive summary (2–3 sentences)**\n\n" + data["executive_summary"].strip())
-        if data.get("key_points"):
-            md.append("**Key points / Results**\n\n" + "\n".join(f"- {x}" for x in data["key_points"]))
-        if data.get("recommendations"):
-            md.append("**Recommendations**\n\n" + "\n".join(f"- {x}" for x in data["recommendations"]))
-        if data.get("remarks"):
-            md.append("**Other important remarks**\n\n" + data["remarks"].strip())
-        return "\n\n".join(md).strip(), data
-    except Exception as e:
-        # Si rate-limit (ou fallback aussi rate-limit) -> résumé local
-        if _is_rate_limit_error(e):
-            return local_summary_markdown(text), None
-        # Sinon, tente le fallback markdown
-        return smart_groq_summary_fallback(text), None
-
-def smart_groq_summary_fallback(text: str) -> str:
-    """Fallback markdown ; si rate-limit -> résumé local."""
-    if not os.environ.get("GROQ_API_KEY", ""):
-        return "[Groq Error] No API key defined"
+    return [{"role": "system", "content": sys}, {"role": "user", "content": user}]
+
+_SUMMARY_SECTIONS = {  # clé JSON -> titre markdown (ordre d'affichage)
+    "executive_summary": "**Executive summary (2–3 sentences)**",
+    "key_points": "**Key points / Results**",
+    "recommendations": "**Recommendations**",
+    "remarks": "**Other important remarks**",
+}
+
+def _section_markdown(key: str, value):
+    """Une section du JSON structuré -> markdown (None si clé inconnue ou valeur vide)."""
+    title = _SUMMARY_SECTIONS.get(key)
+    if not title or not value:
+        return None
+    if isinstance(value, list):
+        body = "\n".join(f"- {x}" for x in value)
+    else:
+        body = str(value).strip()
+    return f"{title}\n\n{body}"
+
+def _structured_summary_markdown(raw: str):
+    """Réponse JSON du modèle -> (markdown, données). Lève une exception si le JSON est invalide."""
+    raw = (raw or "").strip()
+    raw = raw.strip("` \n")
+    if raw.startswith("json"):
+        raw = raw[4:].strip()
+    data = json.loads(raw)
+    md = []
+    for key in _SUMMARY_SECTIONS:
+        section = _section_markdown(key, data.get(key))
+        if section:
+            md.append(section)
+    return "\n\n".join(md).strip(), data
+
+class _JsonSectionParser:
+    """Parseur JSON incrémental de l'objet structuré: feed() renvoie les paires (clé, valeur)
+    de premier niveau dès qu'elles sont complètes dans le flux de tokens."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = None  # position après '{' puis après la dernière valeur lue
+
+    def _skip(self, i: int, chars: str = " \t\r\n") -> int:
+        while i < len(self.buf) and self.buf[i] in chars:
+            i += 1
+        return i
+
+    def feed(self, piece: str):
+        self.buf += piece
+        out = []
+        if self.pos is None:
+            start = self.buf.find("{")  # ignore un éventuel ```json
+            if start < 0:
+                return out
+            self.pos = start + 1
+        while True:
+            i = self._skip(self.pos, " \t\r\n,")
+            if i >= len(self.buf) or self.buf[i] == "}":
+                return out
+            try:
+                key, j = self._decoder.raw_decode(self.buf, i)
+                j = self._skip(j)
+                if j >= len(self.buf) or self.buf[j] != ":" or not isinstance(key, str):
+                    return out
+                j = self._skip(j + 1)
+                if j >= len(self.buf):
+                    return out
+                value, k = self._decoder.raw_decode(self.buf, j)
+            except json.JSONDecodeError:
+                return out  # valeur incomplète: attendre la suite
+            if not isinstance(value, (str, list, dict)):
+                # Nombre/littéral: complet seulement s'il est suivi de ',' ou '}' ("12." peut devenir 12.5)
+                e = self._skip(k)
+                if e >= len(self.buf) or self.buf[e] not in ",}":
+                    return out
+            out.append((key, value))
+            self.pos = k
+
+def _summary_fallback_messages(text: str):
     head = (text or "")[:3800]
     prompt = (
         "Summarize this PDF document in the original language, professionally, as if explaining to an executive. "
@@ -290,25 +1540,12 @@ def smart_groq_summary_fallback(text: str) -> str:
         "**Executive summary (2–3 sentences)**, **Key points / Results**, **Recommendations**, **Other important remarks**.\n\n"
         f"PDF content:\n{head}"
     )
-    try:
-        resp = _groq_chat(
-            messages=[
-                {"role": "system", "content": "You are an expert at summarizing professional and academic documents in all languages."},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=420,
-            temperature=0.2,
-        )
-        return (resp.choices[0].message.content or "").strip()
-    except Exception as e:
-        if _is_rate_limit_error(e):
-            return local_summary_markdown(text)
-        return f"[Groq Error] {e}"
+    return [
+        {"role": "system", "content": "You are an expert at summarizing professional and academic documents in all languages."},
+        {"role": "user", "content": prompt},
+    ]
 
-def smart_groq_qa(context: str, question: str) -> str:
-    """Q&A ; si rate-limit -> réponse locale basée passages."""
-    if not os.environ.get("GROQ_API_KEY", ""):
-        return "[Groq Error] No API key defined"
+def _qa_messages(context: str, question: str):
     user = (
         "Using ONLY the provided PDF excerpts, answer the question accurately. "
         "Quote very short snippets with “…” and mention any visible page/section cues if present. "
@@ -316,21 +1553,112 @@ def smart_groq_qa(context: str, question: str) -> str:
         f"Question: {question}\n\n"
         f"PDF Excerpts:\n{context}"
     )
+    return [
+        {"role": "system", "content": "You are a careful assistant that answers from given context only."},
+        {"role": "user", "content": user},
+    ]
+
+# ---------- LLM calls ----------
+# Natifs asyncio; si rate-limit / modèles indisponibles -> réponses locales (CPU) via le pool CPU.
+# `outcome` (dict optionnel): outcome["local"] = True quand la réponse vient du mode hors ligne.
+# Une réponse locale dépanne pendant l'incident mais ne va pas dans les caches (7 jours, SQLite).
+async def smart_groq_summary_structured_async(text: str, outcome: dict = None):
+    """JSON strict -> MD ; si rate-limit -> résumé local, sinon fallback markdown."""
+    outcome = {} if outcome is None else outcome
+    outcome["local"] = False
+    if not os.environ.get("GROQ_API_KEY", ""):
+        return "[Groq Error] No API key defined", None
     try:
-        resp = _groq_chat(
-            messages=[
-                {"role": "system", "content": "You are a careful assistant that answers from given context only."},
-                {"role": "user", "content": user},
-            ],
-            max_tokens=350,
-            temperature=0.2,
-        )
+        resp = await _groq_chat_async(messages=_summary_structured_messages(text), max_tokens=450, temperature=0.2, task="summary")
+        return _structured_summary_markdown(resp.choices[0].message.content)
+    except Exception as e:
+        if _use_local_fallback(e):
+            outcome["local"] = True
+            return await _run_in(_CPU_POOL, local_summary_markdown, text), None
+        return await smart_groq_summary_fallback_async(text, outcome), None
+
+async def smart_groq_summary_fallback_async(text: str, outcome: dict = None) -> str:
+    outcome = {} if outcome is None else outcome
+    outcome["local"] = False
+    if not os.environ.get("GROQ_API_KEY", ""):
+        return "[Groq Error] No API key defined"
+    try:
+        resp = await _groq_chat_async(messages=_summary_fallback_messages(text), max_tokens=420, temperature=0.2, task="summary")
         return (resp.choices[0].message.content or "").strip()
     except Exception as e:
-        if _is_rate_limit_error(e):
-            return local_qa_answer(context, question)
+        if _use_local_fallback(e):
+            outcome["local"] = True
+            return await _run_in(_CPU_POOL, local_summary_markdown, text)
         return f"[Groq Error] {e}"
 
+async def smart_groq_qa_async(context: str, question: str, outcome: dict = None) -> str:
+    outcome = {} if outcome is None else outcome
+    outcome["local"] = False
+    if not os.environ.get("GROQ_API_KEY", ""):
+        return "[Groq Error] No API key defined"
+    try:
+        resp = await _groq_chat_async(messages=_qa_messages(context, question), max_tokens=350, temperature=0.2, hedge=GROQ_HEDGE, task="qa")
+        return (resp.choices[0].message.content or "").strip()
+    except Exception as e:
+        if _use_local_fallback(e):
+            outcome["local"] = True
+            return await _run_in(_CPU_POOL, local_qa_answer, context, question)
+        return f"[Groq Error] {e}"
+
+async def smart_groq_qa_stream(context: str, question: str, outcome: dict = None):
+    """Q&A en streaming; si rate-limit avant le premier token -> réponse locale streamée par mots.
+    `outcome["complete"]` passe à True si la réponse est entière (fin normale ou réponse locale):
+    une coupure en cours de route ajoute "[Groq Error]" à un texte tronqué, à ne pas mettre en cache."""
+    outcome = {} if outcome is None else outcome
+    outcome["complete"] = outcome["local"] = False
+    if not os.environ.get("GROQ_API_KEY", ""):
+        yield "[Groq Error] No API key defined"
+        return
+    started = False
+    try:
+        async for piece in _groq_stream_async(messages=_qa_messages(context, question), max_tokens=350, temperature=0.2, task="qa"):
+            started = True
+            yield piece
+        outcome["complete"] = True
+    except Exception as e:
+        if started:
+            yield f"\n\n[Groq Error] {e}"
+        elif _use_local_fallback(e):
+            outcome["local"] = True
+            local = await _run_in(_CPU_POOL, local_qa_answer, context, question)
+            for word in re.findall(r"\S+\s*", local):
+                yield word
+            outcome["complete"] = True
+        else:
+            yield f"[Groq Error] {e}"
+
+async def smart_groq_summary_stream(text: str, outcome: dict = None):
+    """Résumé structuré en streaming: {"type": "section", "key", "markdown"} dès qu'une section est complète,
+    puis {"type": "done", "markdown", "data"}. Mêmes fallbacks (et `outcome`) que smart_groq_summary_structured_async."""
+    outcome = {} if outcome is None else outcome
+    outcome["local"] = False
+    if not os.environ.get("GROQ_API_KEY", ""):
+        yield {"type": "done", "markdown": "[Groq Error] No API key defined", "data": None}
+        return
+    parser = _JsonSectionParser()
+    parts = []
+    try:
+        async for piece in _groq_stream_async(messages=_summary_structured_messages(text), max_tokens=450, temperature=0.2, task="summary"):
+            parts.append(piece)
+            for key, value in parser.feed(piece):
+                section = _section_markdown(key, value)
+                if section:
+                    yield {"type": "section", "key": key, "markdown": section}
+        md, data = _structured_summary_markdown("".join(parts))
+    except Exception as e:
+        if not parts and _use_local_fallback(e):
+            outcome["local"] = True
+            md = await _run_in(_CPU_POOL, local_summary_markdown, text)
+        else:
+            md = await smart_groq_summary_fallback_async(text, outcome)
+        data = None
+    yield {"type": "done", "markdown": md, "data": data}
+
 # ---------- Health ----------
 @app.get("/ping")
 def ping():
@@ -349,102 +1677,421 @@ def auth_check(request: Request):
 def premium_check(request: Request):
     return {"premium": is_premium(request)}
 
+# ---------- Stats (admin) ----------
+def _doc_memory_report() -> dict:
+    """Octets mesurés des documents résidents (DOC_STORE), total et par document, par composant."""
+    docs = DOC_STORE.values()
+    totals = {}
+    for d in docs:
+        for part, n in d.memory_report().items():
+            totals[part] = totals.get(part, 0) + n
+    total = sum(totals.values())
+    return {
+        "resident": len(docs),
+        "bytes": total,
+        "bytes_per_doc": total // len(docs) if docs else 0,
+        "bytes_per_text_byte": round(total / totals["text"], 2) if docs else None,
+        "by_part": totals,
+    }
+
+@app.get("/admin/stats")
+def admin_stats(request: Request):
+    if not is_admin(request):
+        return JSONResponse({"error": "Admin required."}, status_code=403)
+    return {
+        "caches": {c.name: c.stats() for c in CACHES},
+        "documents": _doc_memory_report(),
+        "singleflight": {f.name: f.stats() for f in FLIGHTS},
+        "rate_limits": RATE_SCHEDULER.stats(),
+        "circuits": BREAKER.stats(),
+        "latency": _latency_stats(),
+        "hedging": {"enabled": GROQ_HEDGE, **HEDGE_STATS},
+        "router": ROUTER.stats(),
+    }
+
 # ---------- Summarize ----------
-@app.post("/api/summarize")
-async def summarize_pdf(request: Request, file: UploadFile = File(...)):
-    """
-    Upload PDF -> extract -> tidy -> JSON-structured summary (fallback markdown or local).
-    Stocke texte + chunks pour Q&A. Résumé mis en cache 7 jours par document.
-    """
-    tmp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
+UPLOAD_READ_CHUNK = 1 << 20  # 1 MiB
+
+WORD_ESTIMATE_SAMPLE_PAGES = int(os.getenv("WORD_ESTIMATE_SAMPLE_PAGES", "8"))
+WORD_ESTIMATE_Z = 3.0
+
+def estimate_word_count(doc, sample_pages: int = WORD_ESTIMATE_SAMPLE_PAGES):
+    """Estime le nb de mots depuis une page au milieu de chaque strate du document.
+    Retourne (estimation, marge): marge = z * erreur-type (correction population finie), 0 si toutes les pages sont lues."""
+    n = doc.page_count
+    if n == 0:
+        return 0, 0.0
+    k = min(n, max(1, sample_pages))
+    idx = sorted({(2 * i + 1) * n // (2 * k) for i in range(k)})
+    counts = [len(tidy_text(_page_text(doc[i]), nfkc=False).split()) for i in idx]
+    mean = sum(counts) / len(counts)
+    if len(idx) >= n:
+        return sum(counts), 0.0
+    var = sum((c - mean) ** 2 for c in counts) / (len(counts) - 1) if len(counts) > 1 else mean ** 2
+    fpc = (n - len(idx)) / (n - 1)
+    margin = WORD_ESTIMATE_Z * n * math.sqrt(var / len(idx) * fpc)
+    return int(round(mean * n)), margin
+
+def _paywall_response(nb_pages: int, nb_words: int, estimated: bool = False):
+    body = {
+        "error": f"This document exceeds the free limit ({FREE_PAGE_LIMIT} pages or {FREE_WORD_LIMIT} words).",
+        "paywall": True,
+        "nb_pages": nb_pages,
+        "nb_words": nb_words,
+    }
+    if estimated and nb_words is not None:
+        body["nb_words_estimated"] = True
+    return JSONResponse(body, status_code=402)
 
-        # Pages
-        doc = fitz.open(tmp_path)
+def _load_pdf(data: bytes, privileged: bool) -> dict:
+    """Étape PDF (thread dédié): ouverture unique, paywall anticipé si non privilégié, extraction + tidy.
+    Retourne {"pages", "words", "text", "fingerprint"} ou {"pages", "words", "paywall": True}
+    (mots estimés, None si la limite de pages suffit à refuser)."""
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
         nb_pages = doc.page_count
+        if not privileged:
+            # Limite de pages d'abord: aucun échantillonnage de texte pour les documents trop longs
+            if nb_pages > FREE_PAGE_LIMIT:
+                return {"pages": nb_pages, "words": None, "paywall": True}
+            est_words, margin = estimate_word_count(doc)
+            if est_words - margin > FREE_WORD_LIMIT:
+                return {"pages": nb_pages, "words": est_words, "paywall": True}
+        hasher = new_doc_hasher()
+        full_text = tidy_text(extract_pdf_text_sorted(doc, data, hasher), nfkc=False)
+        return {"pages": nb_pages, "words": len(full_text.split()), "text": full_text, "fingerprint": hasher.hexdigest()}
+    finally:
         doc.close()
 
-        raw_text = extract_pdf_text_sorted(tmp_path)
-        full_text = tidy_text(raw_text)
-        nb_words = len(full_text.split())
+def build_doc_entry(full_text: str, nb_pages: int, nb_words: int, fingerprint: str = None) -> CompactDoc:
+    """Entrée DOC_STORE: texte + empreinte + chunks (offsets) + index de recherche compact."""
+    return CompactDoc(full_text, nb_pages, nb_words, fingerprint)
+
+async def _read_upload(file: UploadFile):
+    """Lit l'upload par blocs bornés dans un seul tampon (une seule copie en mémoire)
+    et hache les octets au passage. Retourne (bytearray, sha256 hex)."""
+    buf = bytearray()
+    h = hashlib.sha256()
+    while True:
+        block = await file.read(UPLOAD_READ_CHUNK)
+        if not block:
+            break
+        h.update(block)
+        buf += block
+    return buf, h.hexdigest()
+
+async def _prepare_document(data: bytes, content_hash: str, privileged: bool):
+    """CompactDoc (cache par octets, sinon extraction) ou {"paywall": True, ...} / {"empty": True}."""
+    # Même PDF déjà extrait: texte, compteurs, chunks et index réutilisés sans PyMuPDF
+    entry = await _run_in(_CPU_POOL, EXTRACT_CACHE.get, content_hash)
+    if entry is not None:
+        return entry
+    # Ouverture + paywall anticipé + extraction + tidy, hors de la boucle asyncio
+    loaded = await _run_in(_PDF_POOL, _load_pdf, data, privileged)
+    if loaded.get("paywall"):
+        return loaded
+    if not loaded["text"].strip():
+        return {"empty": True}
+    entry = await _run_in(
+        _CPU_POOL, build_doc_entry, loaded["text"], loaded["pages"], loaded["words"], loaded["fingerprint"]
+    )
+    await _run_in(_CPU_POOL, EXTRACT_CACHE.__setitem__, content_hash, entry)
+    return entry
+
+async def _summary_for(entry: CompactDoc):
+    """Résumé IA mis en cache par empreinte de contenu: (markdown, sections | None)."""
+    dh = entry.fingerprint
+    cached = await _run_in(_CPU_POOL, SUMMARY_CACHE.get, dh)
+    if cached:
+        return cached["md"], None
+    outcome = {}
+    ai_md, ai_sections = await smart_groq_summary_structured_async(entry.text, outcome)
+    if not ai_md.startswith("[Groq Error]") and not outcome["local"]:
+        await _run_in(_CPU_POOL, SUMMARY_CACHE.__setitem__, dh, {"md": ai_md})
+    return ai_md, ai_sections
+
+async def _summarize_admission(request: Request, file: UploadFile):
+    """Upload -> document prêt (extraction ou cache) + paywall.
+    Retourne une JSONResponse (paywall / erreur) ou (entrée document, admin_ok, premium_ok)."""
+    # Upload lu par blocs puis ouvert une seule fois en mémoire (pas de fichier temporaire)
+    data, content_hash = await _read_upload(file)
+    return await _admit_document(data, content_hash, is_admin(request), is_premium(request))
+
+async def _admit_document(data: bytes, content_hash: str, admin_ok: bool, premium_ok: bool):
+    privileged = admin_ok or premium_ok
+
+    entry = await EXTRACT_FLIGHT.do(
+        (content_hash, privileged), lambda: _prepare_document(data, content_hash, privileged)
+    )
+    if isinstance(entry, dict):
+        if entry.get("paywall"):
+            return _paywall_response(entry["pages"], entry["words"], estimated=True)
+        return JSONResponse({"error": "The PDF is empty or unreadable."}, status_code=400)
+
+    # Paywall exact (cas admis par l'estimation mais au-dessus de la limite)
+    if (entry.pages > FREE_PAGE_LIMIT or entry.words > FREE_WORD_LIMIT) and not privileged:
+        return _paywall_response(entry.pages, entry.words)
+    return entry, admin_ok, premium_ok
+
+def _put_document(doc_id: str, entry: CompactDoc):
+    """L'entrée est stockée une fois par empreinte (réécrite seulement si elle n'est plus résidente);
+    chaque upload ne coûte qu'une ligne doc_id -> empreinte."""
+    if not DOC_STORE.touch(entry.fingerprint):
+        DOC_STORE[entry.fingerprint] = entry
+    DOC_IDS[doc_id] = entry.fingerprint
+
+def _get_document(doc_id: str):
+    fingerprint = DOC_IDS.get(doc_id)
+    return DOC_STORE.get(fingerprint) if fingerprint else None
+
+async def _store_document(entry: CompactDoc) -> str:
+    """Enregistre l'entrée (texte + chunks + index) et retourne un nouveau doc_id qui y renvoie."""
+    doc_id = uuid.uuid4().hex
+    await _run_in(_CPU_POOL, _put_document, doc_id, entry)
+    return doc_id
+
+def _sse(data: dict, event: str = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-        if not full_text.strip():
-            return JSONResponse({"error": "The PDF is empty or unreadable."}, status_code=400)
+async def _summary_result(entry: CompactDoc, admin_ok: bool, premium_ok: bool, on_stage=None) -> dict:
+    """Résumé IA (cache par contenu) + heuristique + stockage: corps de réponse de /api/summarize."""
+    if on_stage:
+        await on_stage("summarizing", 60)
+    ai_md, ai_sections = await SUMMARY_FLIGHT.do(entry.fingerprint, lambda: _summary_for(entry))
 
-        admin_ok = is_admin(request)
-        premium_ok = is_premium(request)
+    # Heuristique courte
+    if on_stage:
+        await on_stage("storing", 90)
+    simple = await _run_in(_CPU_POOL, simple_summarizer, entry.text)
 
-        # Paywall
-        if (nb_pages > FREE_PAGE_LIMIT or nb_words > FREE_WORD_LIMIT) and not (admin_ok or premium_ok):
+    doc_id = await _store_document(entry)
+
+    return {
+        "summary": simple,
+        "ai_summary": ai_md,
+        "ai_sections": ai_sections,
+        "nb_pages": entry.pages,
+        "nb_words": entry.words,
+        "paywall": False,
+        "admin_bypass": admin_ok,
+        "premium": premium_ok,
+        "doc_id": doc_id,
+    }
+
+@app.post("/api/summarize")
+async def summarize_pdf(request: Request, file: UploadFile = File(...), async_job: bool = Query(False, alias="async")):
+    """
+    Upload PDF -> extract -> tidy -> JSON-structured summary (fallback markdown or local).
+    Stocke texte + chunks pour Q&A. Résumé mis en cache 7 jours par document.
+    Uploads simultanés du même PDF: une seule extraction et un seul appel LLM (single-flight).
+    `?async=1`: répond tout de suite 202 {"job_id", ...}; suivi via GET /api/jobs/{id} (+ /events en SSE).
+    """
+    try:
+        if async_job:
+            data, content_hash = await _read_upload(file)
+            job = await _submit_job(data, content_hash, is_admin(request), is_premium(request))
+            if job is None:
+                return JSONResponse({"error": "Too many pending jobs, retry later."}, status_code=503)
             return JSONResponse(
                 {
-                    "error": f"This document exceeds the free limit ({FREE_PAGE_LIMIT} pages or {FREE_WORD_LIMIT} words).",
-                    "paywall": True,
-                    "nb_pages": nb_pages,
-                    "nb_words": nb_words,
+                    "job_id": job["id"],
+                    "status": job["status"],
+                    "status_url": f"/api/jobs/{job['id']}",
+                    "events_url": f"/api/jobs/{job['id']}/events",
                 },
-                status_code=402,
+                status_code=202,
             )
 
-        # Cache par contenu
-        dh = _doc_hash(full_text)
-        cached = SUMMARY_CACHE.get(dh)
-        if cached and (time() - cached["ts"] < 7 * 24 * 3600):
-            ai_md, ai_sections = cached["md"], None
-        else:
-            ai_md, ai_sections = smart_groq_summary_structured(full_text)
-            SUMMARY_CACHE[dh] = {"md": ai_md, "ts": time()}
-
-        # Heuristique courte
-        simple = simple_summarizer(full_text)
-
-        # Store + chunks
-        doc_id = uuid.uuid4().hex
-        DOC_STORE[doc_id] = {
-            "text": full_text,
-            "pages": nb_pages,
-            "words": nb_words,
-            "chunks": make_chunks(full_text),
-        }
+        admitted = await _summarize_admission(request, file)
+        if isinstance(admitted, JSONResponse):
+            return admitted
+        return await _summary_result(*admitted)
 
-        return {
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post("/api/summarize/stream")
+async def summarize_pdf_stream(request: Request, file: UploadFile = File(...)):
+    """
+    Comme /api/summarize, en Server-Sent Events:
+    - `event: meta`: nb_pages, nb_words, résumé heuristique, doc_id, drapeaux admin/premium
+    - `event: section`: {"key", "markdown"} dès qu'une section du JSON du modèle est complète
+    - `event: done`: {"ai_summary", "ai_sections"} (markdown final, identique au mode non streamé)
+    """
+    try:
+        admitted = await _summarize_admission(request, file)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if isinstance(admitted, JSONResponse):
+        return admitted
+    entry, admin_ok, premium_ok = admitted
+
+    async def events():
+        simple = await _run_in(_CPU_POOL, simple_summarizer, entry.text)
+        doc_id = await _store_document(entry)
+        yield _sse({
             "summary": simple,
-            "ai_summary": ai_md,
-            "ai_sections": ai_sections,
-            "nb_pages": nb_pages,
-            "nb_words": nb_words,
+            "nb_pages": entry.pages,
+            "nb_words": entry.words,
             "paywall": False,
             "admin_bypass": admin_ok,
             "premium": premium_ok,
             "doc_id": doc_id,
-        }
+        }, event="meta")
+
+        dh = entry.fingerprint
+        cached = await _run_in(_CPU_POOL, SUMMARY_CACHE.get, dh)
+        if cached:
+            yield _sse({"ai_summary": cached["md"], "ai_sections": None}, event="done")
+            return
+        # Même document déjà en cours de résumé (flux ou non): on attend son résultat, sans sections
+        flight = SUMMARY_FLIGHT.claim(dh)
+        if flight is None:
+            ai_md, ai_sections = await SUMMARY_FLIGHT.do(dh, lambda: _summary_for(entry))
+            yield _sse({"ai_summary": ai_md, "ai_sections": ai_sections}, event="done")
+            return
+        try:
+            outcome = {}
+            async for ev in smart_groq_summary_stream(entry.text, outcome):
+                if ev["type"] == "section":
+                    yield _sse({"key": ev["key"], "markdown": ev["markdown"]}, event="section")
+                else:
+                    if not ev["markdown"].startswith("[Groq Error]") and not outcome["local"]:
+                        await _run_in(_CPU_POOL, SUMMARY_CACHE.__setitem__, dh, {"md": ev["markdown"]})
+                    flight.set_result((ev["markdown"], ev["data"]))
+                    yield _sse({"ai_summary": ev["markdown"], "ai_sections": ev["data"]}, event="done")
+        finally:
+            if not flight.done():
+                flight.cancel()  # client parti: les appels en attente relancent le calcul
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+# ---------- Summarize jobs ----------
+# File in-process + pool de workers asyncio (pas de broker). L'état des jobs est aussi écrit dans SQLite
+# (si CACHE_DB_PATH) pour que GET /api/jobs/{id} réponde depuis n'importe quel worker de l'hôte.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOBS = LRUCache("jobs", max_entries=int(os.getenv("JOB_MAX_ENTRIES", "1000")), ttl=JOB_TTL_SECONDS)
+CACHES.append(JOBS)
+_JOB_QUEUE = None  # créée avec les workers par lifespan, sur la boucle de l'application
+_JOB_WORKER_TASKS = []
+_JOB_DB_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")  # un seul écrivain: ordre des états conservé
 
+async def _job_update(job: dict, **fields):
+    job.update(fields, updated=time())
+    if CACHE_DB is not None:
+        await _run_in(_JOB_DB_POOL, CACHE_DB.put, "jobs", job["id"], dict(job))
+
+async def _job_get(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None and CACHE_DB is not None:
+        job = await _run_in(_JOB_DB_POOL, CACHE_DB.get, "jobs", job_id, JOB_TTL_SECONDS)
+    return job
+
+async def _submit_job(data: bytes, content_hash: str, admin_ok: bool, premium_ok: bool):
+    """Crée et met en file un job de résumé; None si la file est pleine."""
+    if _JOB_QUEUE is None:
+        raise RuntimeError("Job workers are not running.")
+    now = time()
+    job = {
+        "id": uuid.uuid4().hex, "status": "queued", "stage": "queued", "progress": 0,
+        "result": None, "error": None, "status_code": None, "created": now, "updated": now,
+    }
+    try:
+        _JOB_QUEUE.put_nowait((job, data, content_hash, admin_ok, premium_ok))
+    except asyncio.QueueFull:
+        return None
+    JOBS[job["id"]] = job
+    queued = dict(job)  # un worker peut démarrer le job pendant l'écriture
+    await _job_update(job)
+    return queued
+
+async def _run_job(job: dict, data: bytes, content_hash: str, admin_ok: bool, premium_ok: bool):
+    stage = lambda name, pct: _job_update(job, stage=name, progress=pct)  # noqa: E731
+    await _job_update(job, status="running", stage="extracting", progress=10)
+    try:
+        admitted = await _admit_document(data, content_hash, admin_ok, premium_ok)
+        if isinstance(admitted, JSONResponse):
+            body = json.loads(admitted.body)
+            await _job_update(job, status="error", stage="done", progress=100, error=body.get("error"),
+                        status_code=admitted.status_code, result=body)
+            return
+        result = await _summary_result(*admitted, on_stage=stage)
+        await _job_update(job, status="done", stage="done", progress=100, result=result, status_code=200)
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
-    finally:
+        await _job_update(job, status="error", stage="done", progress=100, error=str(e), status_code=500)
+
+async def _job_worker():
+    while True:
+        job, *args = await _JOB_QUEUE.get()
         try:
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
-            pass
+            await _run_job(job, *args)
+        finally:
+            _JOB_QUEUE.task_done()
+
+def _start_job_workers():
+    global _JOB_QUEUE
+    _JOB_QUEUE = asyncio.Queue(maxsize=JOB_QUEUE_MAX)
+    _JOB_WORKER_TASKS.extend(asyncio.create_task(_job_worker()) for _ in range(JOB_WORKERS))
+
+async def _stop_job_workers():
+    """Arrêt (fin de lifespan): un lifespan suivant dans le même processus repart d'une file neuve."""
+    global _JOB_QUEUE
+    for task in _JOB_WORKER_TASKS:
+        task.cancel()
+    await asyncio.gather(*_JOB_WORKER_TASKS, return_exceptions=True)
+    _JOB_WORKER_TASKS.clear()
+    _JOB_QUEUE = None
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await _job_get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job."}, status_code=404)
+    return job
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Progression en Server-Sent Events: `event: progress` à chaque changement, puis `event: done`."""
+    if await _job_get(job_id) is None:
+        return JSONResponse({"error": "Unknown job."}, status_code=404)
+
+    async def events():
+        last = None
+        while True:
+            job = await _job_get(job_id)
+            if job is None:
+                yield _sse({"error": "Unknown job."}, event="done")
+                return
+            if job["status"] in ("done", "error"):
+                yield _sse(job, event="done")
+                return
+            state = (job["status"], job["stage"], job["progress"])
+            if state != last:
+                last = state
+                yield _sse({"status": job["status"], "stage": job["stage"], "progress": job["progress"]}, event="progress")
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)
 
 # ---------- Q&A ----------
-@app.post("/api/ask")
-async def ask_pdf(request: Request, payload: dict):
-    """
-    Q&A premium/admin:
-    headers: x-admin-token / x-premium-token
-    body: {"question": str, "doc_id": str (optionnel), "context_hint": str (optionnel)}
-    - Sélection de passages compacte
-    - Cache Q&A 7 jours par (doc_id, question)
-    """
-    admin_ok = is_admin(request)
-    premium_ok = is_premium(request)
-    if not (admin_ok or premium_ok):
+async def _answer_for(doc: CompactDoc, question: str, cache_key) -> str:
+    context = await _run_in(_CPU_POOL, select_passages, doc, question, 6, 10000)
+    outcome = {}
+    answer = await smart_groq_qa_async(context, question, outcome)
+    if isinstance(answer, str) and not answer.startswith("[Groq Error]") and not outcome["local"]:
+        await _run_in(_CPU_POOL, QA_CACHE.__setitem__, cache_key, {"answer": answer})
+    return answer
+
+async def _ask_inputs(request: Request, payload: dict):
+    """Validation commune à /api/ask et /api/ask/stream: JSONResponse d'erreur,
+    ou (question, doc_id, doc | None, context_hint)."""
+    if not (is_admin(request) or is_premium(request)):
         return JSONResponse({"error": "Premium or admin required for Q&A."}, status_code=403)
 
     question = (payload.get("question") or "").strip()
@@ -454,27 +2101,84 @@ async def ask_pdf(request: Request, payload: dict):
     doc_id = (payload.get("doc_id") or "").strip()
     context_hint = (payload.get("context_hint") or "").strip()
 
-    # Cache
-    cache_key = None
-    if doc_id and doc_id in DOC_STORE:
-        cache_key = (doc_id, _norm_q(question))
-        hit = QA_CACHE.get(cache_key)
-        if hit and (time() - hit["ts"] < 7 * 24 * 3600):
-            return {"answer": hit["answer"], "doc_id": doc_id}
-
-    # Contexte
-    context = ""
-    if doc_id and doc_id in DOC_STORE:
-        context = select_passages(DOC_STORE[doc_id]["text"], question, k=6, max_chars=10000)
-    elif context_hint:
-        context = context_hint
-
-    if not context:
+    # Lecture hors boucle: un document absent de la mémoire peut être rechargé depuis SQLite (index reconstruit)
+    doc = await _run_in(_CPU_POOL, _get_document, doc_id) if doc_id else None
+    if not doc and not context_hint:
         return JSONResponse({"error": "No document context available."}, status_code=400)
+    return question, doc_id, doc, context_hint
 
-    answer = smart_groq_qa(context, question)
+@app.post("/api/ask")
+async def ask_pdf(request: Request, payload: dict):
+    """
+    Q&A premium/admin:
+    headers: x-admin-token / x-premium-token
+    body: {"question": str, "doc_id": str (optionnel), "context_hint": str (optionnel)}
+    - Sélection de passages compacte
+    - Cache Q&A 7 jours par (empreinte du document, question normalisée)
+    - Questions identiques simultanées: un seul appel LLM (single-flight)
+    """
+    inputs = await _ask_inputs(request, payload)
+    if isinstance(inputs, JSONResponse):
+        return inputs
+    question, doc_id, doc, context_hint = inputs
 
-    if cache_key and isinstance(answer, str) and not answer.startswith("[Groq Error]"):
-        QA_CACHE[cache_key] = {"answer": answer, "ts": time()}
+    if doc:
+        cache_key = (doc.fingerprint, _norm_q(question))
+        hit = await _run_in(_CPU_POOL, QA_CACHE.get, cache_key)
+        if hit:
+            return {"answer": hit["answer"], "doc_id": doc_id}
+        answer = await QA_FLIGHT.do(cache_key, lambda: _answer_for(doc, question, cache_key))
+        return {"answer": answer, "doc_id": doc_id}
 
+    answer = await smart_groq_qa_async(context_hint, question)
     return {"answer": answer, "doc_id": doc_id or None}
+
+@app.post("/api/ask/stream")
+async def ask_pdf_stream(request: Request, payload: dict):
+    """
+    Q&A en streaming (Server-Sent Events), mêmes entrées que /api/ask.
+    Événements: `data: {"delta": str}` au fil des tokens, puis `event: done` avec {"answer", "doc_id"}.
+    Rate-limit -> l'extrait local est streamé; la réponse finale alimente QA_CACHE.
+    Même question en cours sur le même document (flux ou non): un seul appel LLM, les suivants
+    reçoivent la réponse finale en un seul delta.
+    """
+    inputs = await _ask_inputs(request, payload)
+    if isinstance(inputs, JSONResponse):
+        return inputs
+    question, doc_id, doc, context_hint = inputs
+    cache_key = (doc.fingerprint, _norm_q(question)) if doc else None
+
+    async def events():
+        hit = await _run_in(_CPU_POOL, QA_CACHE.get, cache_key) if cache_key else None
+        if hit:
+            yield _sse({"delta": hit["answer"]})
+            yield _sse({"answer": hit["answer"], "doc_id": doc_id}, event="done")
+            return
+        flight = None
+        if doc:
+            flight = QA_FLIGHT.claim(cache_key)
+            if flight is None:
+                answer = await QA_FLIGHT.do(cache_key, lambda: _answer_for(doc, question, cache_key))
+                yield _sse({"delta": answer})
+                yield _sse({"answer": answer, "doc_id": doc_id}, event="done")
+                return
+            context = await _run_in(_CPU_POOL, select_passages, doc, question, 6, 10000)
+        else:
+            context = context_hint
+        try:
+            parts = []
+            outcome = {}
+            async for piece in smart_groq_qa_stream(context, question, outcome):
+                parts.append(piece)
+                yield _sse({"delta": piece})
+            answer = "".join(parts).strip()
+            if cache_key and answer and outcome["complete"] and not outcome["local"]:
+                await _run_in(_CPU_POOL, QA_CACHE.__setitem__, cache_key, {"answer": answer})
+            if flight is not None:
+                flight.set_result(answer)
+            yield _sse({"answer": answer, "doc_id": doc_id or None}, event="done")
+        finally:
+            if flight is not None and not flight.done():
+                flight.cancel()  # client parti: les appels en attente relancent le calcul
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)